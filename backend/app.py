@@ -1,28 +1,78 @@
 from flask import Flask
 from backend.routes.search_ import search_
+from backend.routes.api import api
 from backend.routes.main import main
-from backend.extensions import db
+from backend.extensions import apply_sqlite_pragmas, db, page_cache
+from backend.schema import upgrade_schema
 
-app = Flask(
-    __name__,
-    template_folder="../frontend/templates",
-    static_folder="../frontend/static",
-)
 
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///../data/food_tracker.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db.init_app(app)
+def create_app(config=None):
+    """создаёт приложение; config дополняет настройки по умолчанию"""
+    app = Flask(
+        __name__,
+        template_folder="../frontend/templates",
+        static_folder="../frontend/static",
+    )
+
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///../data/food_tracker.db"
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # настройки SQLite для каждого соединения: WAL - чтение не ждёт записи
+    # (synchronous=NORMAL в WAL безопасен), чтение файла через mmap, кэш страниц
+    # 64 МБ (отрицательное значение - в КБ), временные таблицы сортировок в памяти
+    app.config["SQLITE_PRAGMAS"] = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    }
+    # разрешает пересборку индекса совпадений через /category/<id>?rebuild=1
+    app.config["MATCH_INDEX_ALLOW_REBUILD"] = False
+    # поиск: размер страницы по умолчанию и максимальный, предел подсчёта совпадений
+    # и размер страницы, начиная с которого ответ отдаётся потоком
+    app.config["SEARCH_PAGE_SIZE"] = 30
+    app.config["SEARCH_MAX_PAGE_SIZE"] = 200
+    app.config["SEARCH_COUNT_CAP"] = 1000
+    app.config["SEARCH_STREAM_MIN_SIZE"] = 100
+    # API цен: предел названий в одном запросе, сколько товаров поиска смотреть,
+    # если точного совпадения нет (0 - не искать), и размер списка для ответа потоком
+    app.config["API_MAX_NAMES"] = 1000
+    app.config["API_SEARCH_LIMIT"] = 5
+    app.config["API_STREAM_MIN_ITEMS"] = 100
+    # история цен: предел товаров в одном запросе и период по умолчанию, дней
+    app.config["PRICE_HISTORY_MAX_IDS"] = 500
+    app.config["PRICE_HISTORY_DAYS"] = 30
+    # корзина: предел позиций в одном расчёте
+    app.config["BASKET_MAX_ITEMS"] = 500
+    # сколько секунд держать выбранные карточки дня на главной (0 - новые на каждый запрос)
+    app.config["CARDS_OF_DAY_TTL"] = 0
+    # кэш страниц: "memory" - в процессе, "filesystem" - общий каталог CACHE_DIR
+    # для нескольких воркеров, "null" - выключен
+    app.config["CACHE_TYPE"] = "memory"
+    app.config["CACHE_MAX_ENTRIES"] = 500
+    app.config["CACHE_MAX_BYTES"] = 64 * 1024 * 1024
+    if config:
+        app.config.update(config)
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config["SQLITE_PRAGMAS"])
+    page_cache.init_app(app, DatasetVersion.current)
+
+    app.register_blueprint(main)
+    app.register_blueprint(search_)
+    app.register_blueprint(api)
+    return app
+
 
 # импортируем модели для создания таблиц
-from backend.models import Product, Category, Store  # noqa: E402,F401
+from backend.models import Product, Category, Store, MatchGroup, MatchGroupItem, DatasetVersion  # noqa: E402,F401
 
-app.register_blueprint(main)
-app.register_blueprint(search_)
+app = create_app()
 
 
 if __name__ == "__main__":
     with app.app_context():
-        # создаём таблицы, данные заполняются отдельным скриптом
-        db.create_all()
+        # создаём таблицы и недостающие индексы, данные заполняются отдельным скриптом
+        upgrade_schema()
 
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
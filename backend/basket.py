@@ -0,0 +1,198 @@
+import re
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import select
+
+from backend.extensions import db
+from backend.matching import normalize_product_name
+from backend.models import MatchGroup, MatchGroupItem, Product, Store
+from backend.offers import chunks, exact_matches, offer
+from backend.search_index import search_products
+
+# позиция корзины: название, как его ввёл пользователь, и количество
+BasketItem = namedtuple("BasketItem", "name quantity")
+
+# количество в конце строки: "молоко x2", "молоко * 2", "молоко ×2" (x и кириллическая х);
+# перед знаком нужен пробел, иначе размеры ("Пакеты 30x40", "Салфетки 3х100") читались бы как количество
+QUANTITY_RE = re.compile(r"\s+[xх×*]\s*(\d+)\s*$", re.IGNORECASE)
+MAX_QUANTITY = 999
+
+
+def parse_basket(text: str):
+    """позиции корзины из текста: одна позиция в строке, пустые строки пропускаются"""
+    items = []
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        quantity = 1
+        match = QUANTITY_RE.search(line)
+        if match and match.start() > 0:
+            quantity = max(1, min(int(match.group(1)), MAX_QUANTITY))
+            line = line[:match.start()]
+        items.append(BasketItem(line, quantity))
+    return items
+
+
+def _seed_products(names):
+    """
+    товары, с которых начинается поиск каждой позиции: все товары с тем же
+    нормализованным названием (по индексу), иначе лучший товар полнотекстового поиска
+    возвращает [[id товаров] для каждой позиции]
+    """
+    normalized = [normalize_product_name(name) for name in names]
+    by_norm = {}
+    for product_id, _, _, _, norm, _ in exact_matches(normalized):
+        by_norm.setdefault(norm, []).append(product_id)
+
+    seeds = []
+    for name, norm in zip(names, normalized):
+        found = by_norm.get(norm)
+        if found is None and norm:
+            products, _, _ = search_products(name, 1)
+            found = [product.id for product in products]
+        seeds.append(found or [])
+    return seeds
+
+
+def _group_members(seed_ids):
+    """
+    товары групп совпадений, в которые входят seed_ids
+    группа "unique" - просто остаток категории, её товары друг другу не замена
+    возвращает {id товара-семени: [id товаров его группы]}
+    """
+    group_of = {}
+    for chunk in chunks(seed_ids):
+        rows = db.session.execute(
+            select(MatchGroupItem.product_id, MatchGroupItem.group_id)
+            .join(MatchGroup, MatchGroup.id == MatchGroupItem.group_id)
+            .where(MatchGroupItem.product_id.in_(chunk), MatchGroup.kind != "unique")
+        )
+        group_of.update((product_id, group_id) for product_id, group_id in rows)
+
+    members = {}
+    for chunk in chunks(set(group_of.values())):
+        rows = db.session.execute(
+            select(MatchGroupItem.group_id, MatchGroupItem.product_id).where(MatchGroupItem.group_id.in_(chunk))
+        )
+        for group_id, product_id in rows:
+            members.setdefault(group_id, []).append(product_id)
+    return {seed: members.get(group_id, []) for seed, group_id in group_of.items()}
+
+
+def optimize_basket(items):
+    """
+    самая дешёвая корзина: целиком в одном магазине и с разбиением по магазинам
+    items - [BasketItem]; каждой позиции подбираются товары той же группы совпадений,
+    цена позиции в магазине - минимум по этим товарам (векторно по всей корзине)
+    """
+    stores = db.session.execute(select(Store.id, Store.name).order_by(Store.id)).all()
+    if not stores:
+        # каталог ещё не загружен: не найдено ничего
+        return {
+            "stores": [],
+            "items": [
+                {"query": item.name, "quantity": item.quantity, "offers": [], "best": None, "line_total": None}
+                for item in items
+            ],
+            "store_totals": [],
+            "best_store": None,
+            "split": {"total": 0.0, "stores": []},
+            "not_found": [item.name for item in items],
+        }
+    store_column = {store_id: column for column, (store_id, _) in enumerate(stores)}
+    store_names = [name for _, name in stores]
+
+    seeds = _seed_products([item.name for item in items])
+    members = _group_members({product_id for found in seeds for product_id in found})
+
+    # кандидаты: (позиция, товар) - товары-семена и все товары их групп
+    candidate_pairs = []
+    for position, found in enumerate(seeds):
+        candidates = set(found)
+        for product_id in found:
+            candidates.update(members.get(product_id, ()))
+        candidate_pairs.extend((position, product_id) for product_id in candidates)
+
+    products = {}
+    for chunk in chunks({product_id for _, product_id in candidate_pairs}):
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.price, Product.url, Product.store_id)
+            .where(Product.id.in_(chunk), Product.price.is_not(None), Product.store_id.is_not(None))
+        )
+        products.update((row.id, row) for row in rows)
+    candidate_pairs = [
+        (position, product_id) for position, product_id in candidate_pairs
+        if product_id in products and products[product_id].store_id in store_column
+    ]
+
+    count, store_count = len(items), len(stores)
+    quantity = np.array([item.quantity for item in items], dtype=float)
+    prices = np.full((count, store_count), np.inf)
+    choice = np.full((count, store_count), -1, dtype=np.int64)
+    if candidate_pairs:
+        positions = np.array([position for position, _ in candidate_pairs], dtype=np.int64)
+        product_ids = np.array([product_id for _, product_id in candidate_pairs], dtype=np.int64)
+        columns = np.array([store_column[products[product_id].store_id] for _, product_id in candidate_pairs])
+        candidate_prices = np.array([products[product_id].price for _, product_id in candidate_pairs])
+
+        # самый дешёвый кандидат каждой клетки (позиция, магазин): сортировка по клетке,
+        # внутри - по цене (и id для устойчивости), первый в каждой клетке - минимум
+        cells = positions * store_count + columns
+        order = np.lexsort((product_ids, candidate_prices, cells))
+        cell_ids, first = np.unique(cells[order], return_index=True)
+        cheapest = order[first]
+        prices.flat[cell_ids] = candidate_prices[cheapest]
+        choice.flat[cell_ids] = product_ids[cheapest]
+
+    available = np.isfinite(prices)
+    found = available.any(axis=1)
+    line_totals = np.where(available, prices * quantity[:, None], 0.0)
+
+    # вся корзина в одном магазине: сумма и сколько найденных где-то позиций в нём нет
+    store_totals = line_totals.sum(axis=0)
+    store_missing = (~available & found[:, None]).sum(axis=0)
+
+    # разбиение: каждая позиция там, где дешевле
+    best_column = np.where(found, prices.argmin(axis=1), -1)
+    best_line = np.where(found, line_totals[np.arange(count), np.maximum(best_column, 0)], 0.0)
+    split_by_store = np.bincount(best_column[found], weights=best_line[found], minlength=store_count)
+    split_items = np.bincount(best_column[found], minlength=store_count)
+
+    result_items = []
+    for position, item in enumerate(items):
+        offers = []
+        for column in range(store_count):
+            row = products.get(int(choice[position, column]))
+            offers.append(offer(row.id, row.name, row.price, row.url, store_names[column]) if row else None)
+        column = int(best_column[position])
+        result_items.append({
+            "query": item.name,
+            "quantity": item.quantity,
+            "offers": offers,
+            "best": offers[column] if column >= 0 else None,
+            "line_total": round(float(best_line[position]), 2) if column >= 0 else None,
+        })
+
+    totals = [
+        {"store": store_names[column], "total": round(float(store_totals[column]), 2),
+         "missing": int(store_missing[column])}
+        for column in range(store_count)
+    ]
+    complete = [total for total in totals if total["missing"] == 0]
+    return {
+        "stores": store_names,
+        "items": result_items,
+        "store_totals": totals,
+        "best_store": min(complete, key=lambda total: total["total"]) if complete and found.any() else None,
+        "split": {
+            "total": round(float(best_line.sum()), 2),
+            "stores": [
+                {"store": store_names[column], "total": round(float(split_by_store[column]), 2),
+                 "items": int(split_items[column])}
+                for column in range(store_count)
+            ],
+        },
+        "not_found": [item.name for item, is_found in zip(items, found) if not is_found],
+    }
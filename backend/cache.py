@@ -0,0 +1,208 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+
+class MemoryCache:
+    """кэш страниц в памяти процесса с вытеснением давно не использованных (LRU)"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, mimetype: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (mimetype, body)
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class FileSystemCache:
+    """
+    кэш страниц в каталоге на диске, общий для нескольких процессов gunicorn
+    запись атомарная (временный файл + rename), время доступа хранится в mtime,
+    при переполнении удаляются файлы, к которым дольше всего не обращались
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key = f.readline().decode().rstrip("\n")
+                mimetype = f.readline().decode().rstrip("\n")
+                body = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        if stored_key != key:
+            return None
+        return mimetype, body
+
+    def set(self, key: str, mimetype: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(f"{key}\n{mimetype}\n".encode())
+                f.write(body)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            count -= 1
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class NullCache:
+    """кэш выключен"""
+
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, mimetype: str, body: bytes):
+        pass
+
+    def clear(self):
+        pass
+
+
+class PageCache:
+    """
+    кэш отрендеренных страниц
+    ключ содержит версию данных, которую увеличивает объединение БД, поэтому после
+    merge все страницы пересчитываются разом; по той же версии выставляются
+    ETag и Last-Modified, и повторный запрос браузера получает 304 без рендеринга
+    """
+
+    def __init__(self):
+        self._version_loader = None
+
+    def init_app(self, app, version_loader):
+        """version_loader() возвращает (версия данных, время обновления)"""
+        app.config.setdefault("CACHE_TYPE", "memory")
+        app.config.setdefault("CACHE_DIR", os.path.join(app.instance_path, "page_cache"))
+        app.config.setdefault("CACHE_MAX_ENTRIES", 500)
+        app.config.setdefault("CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+        cache_type = app.config["CACHE_TYPE"]
+        max_entries = app.config["CACHE_MAX_ENTRIES"]
+        max_bytes = app.config["CACHE_MAX_BYTES"]
+        if cache_type == "memory":
+            backend = MemoryCache(max_entries, max_bytes)
+        elif cache_type == "filesystem":
+            backend = FileSystemCache(app.config["CACHE_DIR"], max_entries, max_bytes)
+        elif cache_type == "null":
+            backend = NullCache()
+        else:
+            raise ValueError(f"неизвестный CACHE_TYPE: {cache_type}")
+
+        app.extensions["page_cache"] = backend
+        self._version_loader = version_loader
+
+    def cached(self, unless=None):
+        """
+        декоратор для view: кэширует ответ 200 по полному пути запроса
+        unless() - если вернул True, запрос идёт мимо кэша
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != "GET" or (unless and unless()):
+                    return view(*args, **kwargs)
+
+                backend = current_app.extensions["page_cache"]
+                version, updated_at = self._version_loader()
+                key = f"{version}:{request.full_path}"
+                etag = hashlib.sha1(key.encode()).hexdigest()
+
+                # у браузера уже есть эта версия страницы
+                if request.if_none_match.contains(etag):
+                    response = make_response("", 304)
+                else:
+                    hit = backend.get(key)
+                    if hit is not None:
+                        mimetype, body = hit
+                        response = current_app.response_class(body, mimetype=mimetype)
+                    else:
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code != 200:
+                            return response
+                        if not response.is_streamed:
+                            backend.set(key, response.mimetype, response.get_data())
+
+                response.set_etag(etag)
+                if updated_at is not None:
+                    response.last_modified = updated_at
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
@@ -0,0 +1,110 @@
+import numpy as np
+from rapidfuzz import fuzz
+
+from backend.matching import score_matrix
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # без scipy назначение один к одному делается жадно
+    linear_sum_assignment = None
+
+# скореры для сопоставления категорий Светофора с категориями Окея
+CATEGORY_SCORERS = (fuzz.ratio, fuzz.token_set_ratio, fuzz.token_sort_ratio)
+CATEGORY_MATCH_THRESHOLD = 75
+
+
+def _assign_best(scores, threshold):
+    """каждой строке - лучший столбец (несколько строк могут получить один столбец)"""
+    if not scores.shape[1]:
+        return []
+    best = scores.argmax(axis=1)
+    return [
+        (i, int(j)) for i, j in enumerate(best)
+        if scores[i, j] >= threshold
+    ]
+
+
+def _assign_one_to_one(scores, threshold):
+    """
+    назначение один к одному с максимальной суммой похожести (венгерский алгоритм);
+    без scipy - жадно, начиная с самой похожей пары
+    """
+    # пары ниже порога не должны влиять на назначение
+    scores = np.where(scores >= threshold, scores, 0)
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(scores, maximize=True)
+        pairs = zip(rows.tolist(), cols.tolist())
+    else:
+        order = np.argsort(-scores, axis=None, kind="stable")
+        used_rows, used_cols = set(), set()
+        pairs = []
+        for i, j in zip(*np.unravel_index(order, scores.shape)):
+            i, j = int(i), int(j)
+            if scores[i, j] < threshold:
+                break
+            if i in used_rows or j in used_cols:
+                continue
+            used_rows.add(i)
+            used_cols.add(j)
+            pairs.append((i, j))
+    return [(i, j) for i, j in pairs if scores[i, j] >= threshold]
+
+
+def match_categories(sources, targets, stored=None, known_targets=(), one_to_one=False,
+                     threshold=CATEGORY_MATCH_THRESHOLD, scorers=CATEGORY_SCORERS):
+    """
+    сопоставляет нормализованные категории sources с категориями targets
+
+    stored - сохранённые сопоставления {категория: (целевая или None, похожесть)},
+    known_targets - целевые категории, которые были при их сохранении;
+    сохранённое сопоставление берётся как есть, заново считаются только новые
+    категории, категории с пропавшей целью и несопоставленные - против новых целей
+    one_to_one=True не даёт двум категориям попасть в одну целевую
+
+    возвращает ({категория: (целевая или None, похожесть)}, сколько посчитано заново)
+    """
+    stored = stored or {}
+    target_index = {t: j for j, t in enumerate(targets)}
+    new_columns = [j for j, t in enumerate(targets) if t not in set(known_targets)]
+
+    mapping = {}
+    pending = []  # (категория, допустимые столбцы или None - все)
+    for source in sources:
+        if source in stored:
+            target, score = stored[source]
+            if target in target_index:
+                mapping[source] = (target, score)
+                continue
+            if target is None:
+                if not new_columns:
+                    mapping[source] = (None, score)
+                    continue
+                pending.append((source, new_columns))
+                continue
+        pending.append((source, None))
+
+    if not pending:
+        return mapping, 0
+
+    # вся матрица похожести считается одним вызовом cdist на скорер
+    scores = score_matrix([source for source, _ in pending], targets, scorers=scorers)
+    for i, (_, columns) in enumerate(pending):
+        if columns is not None:
+            allowed = np.zeros(len(targets), dtype=bool)
+            allowed[columns] = True
+            scores[i, ~allowed] = 0
+    if one_to_one:
+        taken = [target_index[t] for t, _ in mapping.values() if t is not None]
+        scores[:, taken] = 0
+        pairs = _assign_one_to_one(scores, threshold)
+    else:
+        pairs = _assign_best(scores, threshold)
+
+    assigned = {i: j for i, j in pairs}
+    for i, (source, _) in enumerate(pending):
+        j = assigned.get(i)
+        if j is None:
+            mapping[source] = (None, float(scores[i].max()) if len(targets) else 0.0)
+        else:
+            mapping[source] = (targets[j], float(scores[i, j]))
+    return mapping, len(pending)
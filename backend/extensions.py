@@ -1,3 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from backend.cache import PageCache
 
 db = SQLAlchemy()
+page_cache = PageCache()
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    выполняет PRAGMA на каждом новом соединении пула: настройки вроде cache_size
+    и mmap_size действуют только на соединение, journal_mode=WAL запоминается в файле
+    pragmas - {имя: значение}, порядок сохраняется
+    """
+    if engine.url.get_backend_name() != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
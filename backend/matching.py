@@ -0,0 +1,361 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from sqlalchemy.orm import joinedload
+
+from backend.extensions import db
+from backend.models import Category, MatchGroup, MatchGroupItem, Product
+
+# границы похожести для объединения товаров в группу
+SIMILARITY_MIN = 60
+SIMILARITY_MAX = 95
+
+# скореры rapidfuzz, максимум по которым считается похожестью названий
+SIMILARITY_SCORERS = (fuzz.ratio, fuzz.token_set_ratio, fuzz.token_sort_ratio, fuzz.partial_ratio)
+# прежний набор содержал копии этих скореров из fuzzywuzzy, которые округляют
+# результат до целого; учитываем округлённое значение, чтобы пороги не сдвинулись
+SIMILARITY_ROUNDED = (fuzz.ratio, fuzz.token_set_ratio)
+# число потоков для cdist/cpdist (-1 - все ядра)
+SIMILARITY_WORKERS = -1
+
+# размер кэша нормализации для строк, которых нет в БД
+NORMALIZE_CACHE_SIZE = 4096
+
+# пара попадает на сравнение, если у названий не меньше BLOCKING_MIN_WORDS общих слов
+# или не меньше BLOCKING_MIN_TRIGRAMS общих триграмм длинных слов (общее слово от 5 букв,
+# другая форма слова, опечатка)
+BLOCKING_MIN_WORDS = 2
+BLOCKING_MIN_TRIGRAMS = 3
+# ключ, который есть больше чем у этой доли названий категории (и больше чем у
+# BLOCKING_DF_FLOOR названий), пары не различает и в блокировке не участвует
+BLOCKING_MAX_DF = 0.5
+BLOCKING_DF_FLOOR = 20
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_product_name(name: str) -> str:
+    """нормализация имени товара: нечувствительно к регистру, по словам"""
+    if not name:
+        return ""
+    s = name.lower()
+    s = re.sub(r"[^0-9a-zа-яё]+", " ", s)
+    s = re.sub(r"\s+", " ", s)
+    return s.strip()
+
+
+def name_keys(name: str):
+    """нормализованное название и отсортированный набор его слов для колонок Product"""
+    normalized = normalize_product_name(name)
+    return normalized, " ".join(sorted(set(normalized.split())))
+
+
+def product_key(product) -> str:
+    """нормализованное название товара, посчитанное при объединении БД"""
+    if product.normalized_name is not None:
+        return product.normalized_name
+    return normalize_product_name(product.name)
+
+
+def product_tokens(product) -> str:
+    """слова названия товара (колонка name_tokens), из них строятся ключи блокировки"""
+    if product.name_tokens is not None:
+        return product.name_tokens
+    return name_keys(product.name)[1]
+
+
+def _max_over_scorers(score_one, scorers, shape):
+    """максимум по скорерам, score_one(scorer) возвращает массив оценок"""
+    result = np.zeros(shape, dtype=np.float32)
+    for scorer in scorers:
+        scores = score_one(scorer)
+        if scorer in SIMILARITY_ROUNDED:
+            np.maximum(scores, np.round(scores), out=scores)
+        np.maximum(result, scores, out=result)
+    return result
+
+
+def score_matrix(queries, choices, scorers=SIMILARITY_SCORERS, workers=SIMILARITY_WORKERS):
+    """
+    матрица похожести уже нормализованных строк queries x choices
+    каждый скорер считается одним вызовом cdist, результат - максимум по скорерам
+    """
+    return _max_over_scorers(
+        lambda scorer: process.cdist(queries, choices, scorer=scorer, dtype=np.float32, workers=workers),
+        scorers,
+        (len(queries), len(choices)),
+    )
+
+
+def score_pairs(left, right, scorers=SIMILARITY_SCORERS, workers=SIMILARITY_WORKERS):
+    """похожесть попарно выровненных строк left[k] ~ right[k] через cpdist"""
+    return _max_over_scorers(
+        lambda scorer: process.cpdist(left, right, scorer=scorer, dtype=np.float32, workers=workers),
+        scorers,
+        (len(left),),
+    )
+
+
+def _blocking_keys(tokens: str):
+    """
+    ключи блокировки: (слова названия, триграммы длинных слов)
+    tokens - слова через пробел: name_tokens товара или нормализованное название
+    """
+    words = set(tokens.split())
+    trigrams = set()
+    for token in words:
+        if len(token) > 3:
+            trigrams.update(token[k:k + 3] for k in range(len(token) - 2))
+    return words, trigrams
+
+
+def _shared_keys(keys_per_name, limit: int, minimum: int):
+    """
+    для каждого i - массив j > i, у которых с i не меньше minimum общих ключей
+    keys_per_name - наборы ключей; ключи, которые есть больше чем у limit названий, не учитываются
+    """
+    index = {}
+    for i, keys in enumerate(keys_per_name):
+        for key in keys:
+            index.setdefault(key, []).append(i)
+    index = {key: np.array(postings) for key, postings in index.items() if len(postings) <= limit}
+
+    result = []
+    for i, keys in enumerate(keys_per_name):
+        # хвосты списков после i: пары считаются один раз, j > i
+        postings = [p[np.searchsorted(p, i, side="right"):] for p in map(index.get, keys) if p is not None]
+        if not postings:
+            result.append(np.empty(0, dtype=np.int64))
+            continue
+        others, shared = np.unique(np.concatenate(postings), return_counts=True)
+        result.append(others[shared >= minimum])
+    return result
+
+
+def candidate_pairs(names, min_words=BLOCKING_MIN_WORDS, min_trigrams=BLOCKING_MIN_TRIGRAMS):
+    """
+    блокировка через инвертированные индексы по словам и по триграммам
+    names - name_tokens или нормализованные названия; для каждого i возвращает отсортированный список j > i,
+    у которых с i не меньше min_words общих слов или не меньше min_trigrams общих триграмм
+    """
+    keys = [_blocking_keys(name) for name in names]
+    limit = max(int(BLOCKING_MAX_DF * len(names)), BLOCKING_DF_FLOOR)
+    by_words = _shared_keys([words for words, _ in keys], limit, min_words)
+    by_trigrams = _shared_keys([trigrams for _, trigrams in keys], limit, min_trigrams)
+    return [np.union1d(w, t).tolist() for w, t in zip(by_words, by_trigrams)]
+
+
+def _similar_pairs(normalized, blocking=True, tokens=None):
+    """
+    для каждого i возвращает отсортированный список j > i,
+    похожесть которых попадает в [SIMILARITY_MIN, SIMILARITY_MAX)
+    normalized - уже нормализованные названия, tokens - их сохранённые слова для блокировки
+    """
+    empty = np.array([not n for n in normalized], dtype=bool)
+
+    if blocking:
+        candidates = candidate_pairs(normalized if tokens is None else tokens)
+        rows = np.fromiter(
+            (i for i, row in enumerate(candidates) for _ in row), dtype=np.int64
+        )
+        cols = np.fromiter((j for row in candidates for j in row), dtype=np.int64)
+        scores = score_pairs([normalized[i] for i in rows], [normalized[j] for j in cols])
+    else:
+        matrix = score_matrix(normalized, normalized)
+        rows, cols = np.triu_indices(len(normalized), k=1)
+        scores = matrix[rows, cols]
+
+    keep = (scores >= SIMILARITY_MIN) & (scores < SIMILARITY_MAX) & ~empty[rows] & ~empty[cols]
+
+    matches = [[] for _ in normalized]
+    for i, j in zip(rows[keep].tolist(), cols[keep].tolist()):
+        matches[i].append(j)
+    return matches
+
+
+def check_blocking_recall(names, min_words=BLOCKING_MIN_WORDS, min_trigrams=BLOCKING_MIN_TRIGRAMS):
+    """
+    сравнивает блокировку с полным перебором пар (names - нормализованные названия)
+    возвращает (число похожих пар, сколько из них нашла блокировка, потерянные пары,
+    число пар-кандидатов блокировки)
+    """
+    exact = _similar_pairs(names, blocking=False)
+    candidates = candidate_pairs(names, min_words=min_words, min_trigrams=min_trigrams)
+
+    total = 0
+    missed = []
+    for i, row in enumerate(exact):
+        found = set(candidates[i])
+        total += len(row)
+        missed.extend((names[i], names[j]) for j in row if j not in found)
+    return total, total - len(missed), missed, sum(len(row) for row in candidates)
+
+
+def group_category_products(products, blocking=True):
+    """
+    делит товары категории на три части:
+    есть в обоих магазинах, группы похожих и уникальные
+    blocking=False сравнивает каждую пару (медленно, для проверки)
+    """
+    # группируем товары по нормализованному названию
+    by_norm = {}
+    for p in products:
+        key = product_key(p)
+        by_norm.setdefault(key, []).append(p)
+
+    # разделяем на товары в обоих магазинах и остальные
+    in_both = []
+    remaining = []
+
+    for key, plist in by_norm.items():
+        stores = {p.store.name for p in plist}
+        if len(stores) >= 2:
+            in_both.append({"name": plist[0].name, "products": plist})
+        else:
+            remaining.extend(plist)
+
+    # ищем похожие товары среди оставшихся
+    similar_groups = []
+    used_ids = set()
+
+    remaining_sorted = sorted(remaining, key=product_key)
+    matches = _similar_pairs(
+        [product_key(p) for p in remaining_sorted],
+        blocking=blocking,
+        tokens=[product_tokens(p) for p in remaining_sorted],
+    )
+
+    for i, p1 in enumerate(remaining_sorted):
+        if p1.id in used_ids:
+            continue
+
+        group = [p1]
+
+        # добавляем похожие товары, которые ещё не попали в другие группы
+        for j in matches[i]:
+            p2 = remaining_sorted[j]
+            if p2.id in used_ids:
+                continue
+            group.append(p2)
+            used_ids.add(p2.id)
+
+        if len(group) > 1:
+            group_display_name = min(group, key=lambda p: len(p.name)).name
+            similar_groups.append({
+                "name": group_display_name,
+                "products": group,
+                "products_by_store": _products_by_store(group),
+            })
+            for p in group:
+                used_ids.add(p.id)
+
+    # оставшиеся уникальные товары
+    unique_products = [p for p in remaining if p.id not in used_ids]
+
+    return in_both, similar_groups, unique_products
+
+
+def _products_by_store(products):
+    """раскладывает товары группы по магазинам"""
+    products_by_store = {}
+    for p in products:
+        products_by_store.setdefault(p.store.name, []).append(p)
+    return products_by_store
+
+
+def clear_match_index(category_id: int):
+    """удаляет сохранённые группы категории"""
+    group_ids = db.session.query(MatchGroup.id).filter(MatchGroup.category_id == category_id)
+    db.session.query(MatchGroupItem).filter(
+        MatchGroupItem.group_id.in_(group_ids.scalar_subquery())
+    ).delete(synchronize_session=False)
+    db.session.query(MatchGroup).filter(
+        MatchGroup.category_id == category_id
+    ).delete(synchronize_session=False)
+
+
+def build_match_index(category_id: int):
+    """пересчитывает индекс совпадений для одной категории (без commit)"""
+    clear_match_index(category_id)
+
+    products = (
+        Product.query.options(joinedload(Product.store))
+        .filter_by(category_id=category_id)
+        .order_by(Product.id)
+        .all()
+    )
+    in_both, similar_groups, unique_products = group_category_products(products)
+
+    groups = [("both", g["name"], g["products"]) for g in in_both]
+    groups += [("similar", g["name"], g["products"]) for g in similar_groups]
+    # у пустой категории остаётся пустая группа "unique" - отметка, что индекс построен,
+    # иначе страница категории пересчитывала бы его при каждом запросе
+    if unique_products or not groups:
+        groups.append(("unique", None, unique_products))
+
+    for position, (kind, name, group_products) in enumerate(groups):
+        group = MatchGroup(category_id=category_id, kind=kind, name=name, position=position)
+        db.session.add(group)
+        db.session.flush()
+        db.session.add_all(
+            MatchGroupItem(group_id=group.id, product_id=p.id, position=i)
+            for i, p in enumerate(group_products)
+        )
+
+
+def rebuild_match_index(category_ids=None):
+    """пересчитывает индекс совпадений для указанных (или всех) категорий"""
+    if category_ids is None:
+        category_ids = [row.id for row in db.session.query(Category.id).order_by(Category.id)]
+
+    for category_id in category_ids:
+        build_match_index(category_id)
+    db.session.commit()
+    return len(category_ids)
+
+
+def load_category_groups(category_id: int):
+    """
+    читает сохранённое разбиение категории
+    возвращает None, если индекс для категории ещё не построен
+    """
+    groups = (
+        MatchGroup.query.filter_by(category_id=category_id)
+        .order_by(MatchGroup.position)
+        .all()
+    )
+    if not groups:
+        return None
+
+    items = (
+        MatchGroupItem.query.options(
+            joinedload(MatchGroupItem.product).joinedload(Product.store)
+        )
+        .join(MatchGroup, MatchGroupItem.group_id == MatchGroup.id)
+        .filter(MatchGroup.category_id == category_id)
+        .order_by(MatchGroup.position, MatchGroupItem.position)
+        .all()
+    )
+    products_by_group = {}
+    for item in items:
+        products_by_group.setdefault(item.group_id, []).append(item.product)
+
+    in_both = []
+    similar_groups = []
+    unique_products = []
+
+    for group in groups:
+        group_products = products_by_group.get(group.id, [])
+        if group.kind == "both":
+            in_both.append({"name": group.name, "products": group_products})
+        elif group.kind == "similar":
+            similar_groups.append({
+                "name": group.name,
+                "products": group_products,
+                "products_by_store": _products_by_store(group_products),
+            })
+        else:
+            unique_products.extend(group_products)
+
+    return in_both, similar_groups, unique_products
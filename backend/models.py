@@ -1,3 +1,8 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import OperationalError
+
 from backend.extensions import db
 
 
@@ -10,7 +15,10 @@ class Store(db.Model):
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), nullable=False)
+    # индекс отдаёт /categories уже отсортированными по названию
+    name = db.Column(db.String(50), nullable=False, index=True)
+    # нормализованное название, по которому объединение БД узнаёт категорию
+    normalized_name = db.Column(db.String(50), unique=True)
     image = db.Column(db.String(100))
 
     def __repr__(self):
@@ -18,13 +26,125 @@ class Category(db.Model):
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    # нормализованное название (ключ группировки и сортировки) и его слова
+    # по алфавиту без повторов; заполняются при объединении БД
+    normalized_name = db.Column(db.String(100), index=True)
+    name_tokens = db.Column(db.String(100))
+    # последняя известная цена: кэш последней записи price_history
     price = db.Column(db.Float)
+    # ссылка на товар в магазине: вместе с магазином однозначно задаёт товар
+    url = db.Column(db.String(300))
+    # отдельный индекс по store_id не нужен: его заменяет ix_product_store_url (store_id - первая колонка)
     store_id = db.Column(db.Integer, db.ForeignKey('store.id'))
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), index=True)
 
     store = db.relationship('Store', backref='products')
     category = db.relationship('Category', backref='products')
 
+    # обычный уникальный индекс, а не UNIQUE в таблице: его можно убрать на время загрузки
+    __table_args__ = (db.Index('ix_product_store_url', 'store_id', 'url', unique=True),)
+
     def __repr__(self):
         return f"<Product {self.name}>"
+
+
+class PriceHistory(db.Model):
+    """
+    история цен товара: только изменения, новая строка - когда цена стала другой
+    таблица без rowid с ключом (товар, время) - строки лежат прямо в индексе,
+    последняя цена и цены за период читаются одним проходом по ключу
+    """
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    # время наблюдения, секунды unix: короче строки DateTime
+    observed_at = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('store.id'), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    def __repr__(self):
+        return f"<PriceHistory {self.product_id}@{self.observed_at}: {self.price}>"
+
+
+class MatchGroup(db.Model):
+    """группа товаров категории из индекса совпадений"""
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    # both - есть в обоих магазинах, similar - похожие, unique - уникальные
+    kind = db.Column(db.String(10), nullable=False)
+    name = db.Column(db.String(100))
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    category = db.relationship('Category', backref='match_groups')
+
+    # группы категории читаются по порядку прямо из индекса, без сортировки
+    __table_args__ = (db.Index('ix_match_group_category_position', 'category_id', 'position'),)
+
+    def __repr__(self):
+        return f"<MatchGroup {self.kind} {self.name}>"
+
+class MatchGroupItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('match_group.id'), nullable=False)
+    # по товару корзина находит его группу
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+
+    group = db.relationship('MatchGroup', backref='items')
+    product = db.relationship('Product')
+
+    __table_args__ = (db.Index('ix_match_group_item_group_position', 'group_id', 'position'),)
+
+    def __repr__(self):
+        return f"<MatchGroupItem {self.group_id}:{self.product_id}>"
+
+
+class CategoryMapping(db.Model):
+    """
+    принятое сопоставление категории источника с категорией основной БД
+    объединение БД берёт его отсюда и не пересчитывает похожесть заново
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(20), nullable=False)
+    source_norm = db.Column(db.String(50), nullable=False)
+    # None - подходящей категории не нашлось, категория остаётся своей
+    target_norm = db.Column(db.String(50))
+    score = db.Column(db.Float)
+
+    __table_args__ = (db.UniqueConstraint('source', 'source_norm'),)
+
+    def __repr__(self):
+        return f"<CategoryMapping {self.source}:{self.source_norm} -> {self.target_norm}>"
+
+
+class DatasetVersion(db.Model):
+    """версия данных каталога, меняется при каждом объединении БД"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def current(cls):
+        """(версия, время обновления); для БД без таблицы версий - ("0", None)"""
+        try:
+            row = db.session.query(cls.version, cls.updated_at).filter_by(id=1).first()
+        except OperationalError:
+            db.session.rollback()
+            return "0", None
+        if row is None:
+            return "0", None
+        return row.version, row.updated_at.replace(tzinfo=timezone.utc)
+
+    @classmethod
+    def bump(cls):
+        """выдаёт данным новую версию (новый uuid: номер не повторится и после пересоздания БД)"""
+        row = db.session.get(cls, 1) or cls(id=1)
+        row.version = uuid.uuid4().hex
+        row.updated_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        db.session.add(row)
+        db.session.commit()
+        return row.version
+
+    def __repr__(self):
+        return f"<DatasetVersion {self.version}>"
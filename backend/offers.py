@@ -0,0 +1,33 @@
+from sqlalchemy import select
+
+from backend.extensions import db
+from backend.models import Product, Store
+
+# сколько значений передавать одним запросом IN (SQLite ограничивает число параметров)
+LOOKUP_CHUNK = 500
+
+
+def chunks(values, size: int = LOOKUP_CHUNK):
+    """values частями не больше size (для запросов IN)"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def offer(product_id, name, price, url, store_name) -> dict:
+    """предложение товара в магазине для ответа API и страницы корзины"""
+    return {"product_id": product_id, "store": store_name, "name": name, "price": price, "url": url}
+
+
+def exact_matches(normalized_names):
+    """
+    товары с нормализованным названием из normalized_names (по индексу normalized_name,
+    по LOOKUP_CHUNK названий на запрос); генератор строк
+    (id, name, price, url, normalized_name, store_name) - цена и магазин могут быть None
+    """
+    for chunk in chunks(sorted(set(filter(None, normalized_names)))):
+        yield from db.session.execute(
+            select(Product.id, Product.name, Product.price, Product.url, Product.normalized_name, Store.name)
+            .outerjoin(Store, Store.id == Product.store_id)
+            .where(Product.normalized_name.in_(chunk))
+        )
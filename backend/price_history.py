@@ -0,0 +1,118 @@
+import time
+
+from sqlalchemy import bindparam, text
+
+from backend.extensions import db
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def record_price_changes(observed_at=None) -> int:
+    """
+    дописывает в историю текущие цены товаров, которые отличаются от последней
+    записанной (или у товара ещё нет истории); возвращает число новых записей
+    последняя запись товара находится по ключу (product_id, observed_at) без сортировки
+    """
+    result = db.session.execute(
+        text("""
+            INSERT OR REPLACE INTO price_history (product_id, observed_at, store_id, price)
+            SELECT p.id, :observed_at, p.store_id, p.price
+            FROM product AS p
+            WHERE p.price IS NOT NULL AND p.store_id IS NOT NULL
+              AND p.price IS NOT (
+                  SELECT h.price FROM price_history AS h
+                  WHERE h.product_id = p.id
+                  ORDER BY h.observed_at DESC LIMIT 1
+              )
+        """),
+        {"observed_at": observed_at if observed_at is not None else _now()},
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def copy_price_history(old_db_path: str) -> int:
+    """
+    переносит историю цен из прежней основной БД в собираемую заново: id товаров
+    новые, поэтому запись находит свой товар по магазину и ссылке
+    история пропавших товаров не переносится; возвращает число перенесённых записей
+    """
+    db.session.commit()
+    # ATTACH действует на одно соединение и не выполняется внутри транзакции
+    with db.engine.connect() as connection:
+        connection.execute(text("ATTACH DATABASE :path AS old_main"), {"path": old_db_path})
+        try:
+            tables = set(connection.execute(
+                text("SELECT name FROM old_main.sqlite_master WHERE type = 'table'")
+            ).scalars())
+            product_columns = {row[1] for row in connection.execute(text("PRAGMA old_main.table_info(product)"))}
+            if "price_history" not in tables or "url" not in product_columns:
+                # БД из старой версии: истории ещё нет
+                return 0
+            result = connection.execute(text("""
+                INSERT INTO price_history (product_id, observed_at, store_id, price)
+                SELECT p.id, h.observed_at, p.store_id, h.price
+                FROM old_main.price_history AS h
+                JOIN old_main.product AS old_p ON old_p.id = h.product_id
+                JOIN old_main.store AS old_s ON old_s.id = old_p.store_id
+                JOIN store AS s ON s.name = old_s.name
+                JOIN product AS p ON p.store_id = s.id AND p.url = old_p.url
+                ORDER BY p.id, h.observed_at
+            """))
+            connection.commit()
+            return result.rowcount
+        finally:
+            connection.rollback()
+            connection.execute(text("DETACH DATABASE old_main"))
+
+
+def latest_prices(product_ids):
+    """{id товара: (цена, время изменения)} по последней записи истории"""
+    if not product_ids:
+        return {}
+    rows = db.session.execute(
+        text("""
+            SELECT h.product_id, h.price, h.observed_at
+            FROM price_history AS h
+            WHERE h.product_id IN :ids
+              AND h.observed_at = (
+                  SELECT max(last.observed_at) FROM price_history AS last
+                  WHERE last.product_id = h.product_id
+              )
+        """).bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(product_ids)},
+    )
+    return {product_id: (price, observed_at) for product_id, price, observed_at in rows}
+
+
+def price_range(product_ids, since: int, until=None):
+    """
+    {id товара: (минимальная, максимальная цена)} за период [since, until]
+    история хранит только изменения, поэтому к изменениям внутри периода
+    добавляется цена, действовавшая на его начало (последняя запись до since)
+    """
+    if not product_ids:
+        return {}
+    rows = db.session.execute(
+        text("""
+            SELECT product_id, min(price), max(price) FROM (
+                SELECT h.product_id, h.price
+                FROM price_history AS h
+                WHERE h.product_id IN :ids AND h.observed_at >= :since AND h.observed_at <= :until
+                UNION ALL
+                SELECT p.id, (
+                    SELECT h.price FROM price_history AS h
+                    WHERE h.product_id = p.id AND h.observed_at < :since
+                    ORDER BY h.observed_at DESC LIMIT 1
+                )
+                FROM product AS p
+                WHERE p.id IN :ids
+            )
+            WHERE price IS NOT NULL
+            GROUP BY product_id
+        """).bindparams(bindparam("ids", expanding=True)),
+        {"ids": list(product_ids), "since": since, "until": until if until is not None else _now()},
+    )
+    return {product_id: (low, high) for product_id, low, high in rows}
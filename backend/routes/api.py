@@ -0,0 +1,198 @@
+import time
+
+import orjson
+from flask import Blueprint, current_app, request, stream_with_context
+
+from backend.basket import BasketItem, MAX_QUANTITY, optimize_basket
+from backend.extensions import page_cache
+from backend.matching import normalize_product_name
+from backend.models import DatasetVersion
+from backend.offers import LOOKUP_CHUNK, chunks, exact_matches, offer
+from backend.price_history import latest_prices, price_range
+from backend.search_index import search_products
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+
+def _json(data, status: int = 200):
+    return current_app.response_class(orjson.dumps(data), status=status, mimetype="application/json")
+
+
+def _exact_offers(normalized_names):
+    """
+    товары с таким же нормализованным названием (по индексу normalized_name)
+    возвращает {нормализованное название: {магазин: самое дешёвое предложение}}
+    """
+    offers = {}
+    for product_id, name, price, url, normalized, store_name in exact_matches(normalized_names):
+        if price is None or store_name is None:
+            continue
+        by_store = offers.setdefault(normalized, {})
+        best = by_store.get(store_name)
+        if best is None or (price, product_id) < (best["price"], best["product_id"]):
+            by_store[store_name] = offer(product_id, name, price, url, store_name)
+    return offers
+
+
+def _search_offers(query: str, limit: int):
+    """запасной вариант без точного совпадения: лучшие товары полнотекстового поиска"""
+    products, _, _ = search_products(query, limit)
+    by_store = {}
+    for product in products:
+        if product.price is None or product.store is None:
+            continue
+        best = by_store.get(product.store.name)
+        if best is None or product.price < best["price"]:
+            by_store[product.store.name] = offer(
+                product.id, product.name, product.price, product.url, product.store.name
+            )
+    return by_store
+
+
+def _lookup_items(names, search_limit: int):
+    """
+    результат поиска каждого названия (генератор, по LOOKUP_CHUNK названий на запрос к БД):
+    самое дешёвое предложение каждого магазина и самое дешёвое из всех
+    """
+    for chunk in chunks(names, LOOKUP_CHUNK):
+        normalized = [normalize_product_name(name) for name in chunk]
+        exact = _exact_offers(normalized)
+        for name, norm in zip(chunk, normalized):
+            by_store = exact.get(norm)
+            is_exact = by_store is not None
+            if not is_exact:
+                by_store = _search_offers(name, search_limit) if norm and search_limit else {}
+            stores = sorted(by_store.values(), key=lambda entry: (entry["price"], entry["store"]))
+            yield {
+                "query": name,
+                "normalized": norm,
+                "exact": is_exact,
+                "cheapest": stores[0] if stores else None,
+                "stores": stores,
+            }
+
+
+def _stream_items(head: dict, items):
+    """
+    ответ {head, "items": [...]} по частям (head не пустой): каждый элемент
+    сериализуется и отдаётся сразу, весь массив в памяти не собирается
+    """
+    yield orjson.dumps(head)[:-1] + b',"items":['
+    for i, item in enumerate(items):
+        yield (b"," if i else b"") + orjson.dumps(item)
+    yield b"]}"
+
+
+def _names_from_request():
+    """названия из ?name=...&name=... или из тела POST {"names": [...]}; None - неверный запрос"""
+    if request.method == "GET":
+        return [name.strip() for name in request.args.getlist("name")]
+    try:
+        payload = orjson.loads(request.get_data())
+    except orjson.JSONDecodeError:
+        return None
+    names = payload.get("names") if isinstance(payload, dict) else None
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return None
+    return [name.strip() for name in names]
+
+
+@api.route("/prices", methods=["GET", "POST"])
+@page_cache.cached()
+def prices():
+    """
+    цены списка покупок за один запрос: для каждого названия - самое дешёвое
+    предложение в каждом магазине и самое дешёвое из всех
+    """
+    config = current_app.config
+    names = _names_from_request()
+    if names is None:
+        return _json({"error": 'ожидается JSON {"names": ["название", ...]}'}, 400)
+    if not names:
+        return _json({"error": "не передано ни одного названия"}, 400)
+    if len(names) > config["API_MAX_NAMES"]:
+        return _json({"error": f"не больше {config['API_MAX_NAMES']} названий за запрос"}, 400)
+
+    head = {"version": DatasetVersion.current()[0]}
+    items = _lookup_items(names, config["API_SEARCH_LIMIT"])
+    # длинный список отдаём потоком, не собирая весь ответ в памяти
+    if len(names) >= config["API_STREAM_MIN_ITEMS"]:
+        return current_app.response_class(
+            stream_with_context(_stream_items(head, items)), mimetype="application/json"
+        )
+    return _json({**head, "items": list(items)})
+
+
+def _basket_from_request():
+    """
+    позиции корзины из тела POST {"items": ["название" или {"name": ..., "quantity": n}, ...]}
+    None - неверный запрос
+    """
+    try:
+        payload = orjson.loads(request.get_data())
+    except orjson.JSONDecodeError:
+        return None
+    raw_items = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(raw_items, list):
+        return None
+    items = []
+    for raw in raw_items:
+        if isinstance(raw, str):
+            raw = {"name": raw}
+        if not isinstance(raw, dict) or not isinstance(raw.get("name"), str):
+            return None
+        quantity = raw.get("quantity", 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or not 1 <= quantity <= MAX_QUANTITY:
+            return None
+        if raw["name"].strip():
+            items.append(BasketItem(raw["name"].strip(), quantity))
+    return items
+
+
+@api.route("/basket", methods=["POST"])
+def basket():
+    """самая дешёвая корзина: целиком в одном магазине и с разбиением по магазинам"""
+    items = _basket_from_request()
+    if items is None:
+        return _json({"error": 'ожидается JSON {"items": ["название" или {"name": ..., "quantity": n}, ...]}'}, 400)
+    if not items:
+        return _json({"error": "корзина пуста"}, 400)
+    max_items = current_app.config["BASKET_MAX_ITEMS"]
+    if len(items) > max_items:
+        return _json({"error": f"не больше {max_items} позиций в корзине"}, 400)
+    return _json({"version": DatasetVersion.current()[0], **optimize_basket(items)})
+
+
+@api.route("/price-history")
+def price_history():
+    """
+    история цен товаров ?id=...&id=...: последняя цена и когда она установилась,
+    минимальная и максимальная цена за ?days= дней (по умолчанию PRICE_HISTORY_DAYS)
+    товары без истории цен в ответ не попадают
+    """
+    config = current_app.config
+    try:
+        ids = sorted({int(value) for value in request.args.getlist("id")})
+        days = int(request.args.get("days", config["PRICE_HISTORY_DAYS"]))
+    except ValueError:
+        return _json({"error": "id и days должны быть целыми числами"}, 400)
+    if not ids:
+        return _json({"error": "не передано ни одного id товара"}, 400)
+    if len(ids) > config["PRICE_HISTORY_MAX_IDS"]:
+        return _json({"error": f"не больше {config['PRICE_HISTORY_MAX_IDS']} товаров за запрос"}, 400)
+    if days < 1:
+        return _json({"error": "days должно быть не меньше 1"}, 400)
+
+    since = int(time.time()) - days * 24 * 3600
+    items = []
+    for chunk in chunks(ids, LOOKUP_CHUNK):
+        latest = latest_prices(chunk)
+        ranges = price_range(chunk, since)
+        for product_id in chunk:
+            if product_id not in latest:
+                continue
+            price, changed_at = latest[product_id]
+            low, high = ranges.get(product_id, (price, price))
+            items.append({"product_id": product_id, "price": price, "changed_at": changed_at,
+                          "min": low, "max": high})
+    return _json({"version": DatasetVersion.current()[0], "since": since, "items": items})
@@ -1,133 +1,99 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, current_app, render_template, request
+from backend.basket import optimize_basket, parse_basket
+from backend.extensions import db, page_cache
+from backend.matching import build_match_index, load_category_groups
 from backend.models import Product, Category
-from rapidfuzz import fuzz
-from fuzzywuzzy import fuzz as fw_fuzz
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
 import random
-import re
+import time
 
 main = Blueprint("main", __name__)
 
+CARDS_OF_DAY = 4
 
-def _normalize_product_name(name: str) -> str:
-    """нормализация имени товара: нечувствительно к регистру, по словам"""
-    if not name:
-        return ""
-    s = name.lower()
-    s = re.sub(r"[^0-9a-zа-яё]+", " ", s)
-    s = re.sub(r"\s+", " ", s)
-    return s.strip()
+# выбранные карточки дня: (id товаров, время, до которого они действуют)
+_cards_cache = {"ids": [], "expires": 0.0}
 
 
-def _calculate_similarity(name1: str, name2: str) -> float:
+def _random_product_ids(count: int):
     """
-    вычисляет похожесть двух названий товаров, используя несколько методов
-    возвращает максимальный score из разных алгоритмов
+    случайные id товаров без загрузки каталога: берём случайные числа до max(id)
+    и для каждого ближайший существующий id (один запрос на все пробы)
     """
-    n1 = _normalize_product_name(name1)
-    n2 = _normalize_product_name(name2)
-    
-    if not n1 or not n2:
-        return 0.0
-    
-    scores = [
-        fuzz.ratio(n1, n2),
-        fuzz.token_set_ratio(n1, n2),
-        fuzz.token_sort_ratio(n1, n2),
-        fuzz.partial_ratio(n1, n2),
-        fw_fuzz.ratio(n1, n2),
-        fw_fuzz.token_set_ratio(n1, n2),
-        fw_fuzz.partial_ratio(n1, n2),
-    ]
-    
-    return max(scores)
+    max_id = db.session.query(func.max(Product.id)).scalar()
+    if not max_id:
+        return []
+
+    probes = [random.randint(1, max_id) for _ in range(count * 3)]
+    row = db.session.execute(select(*[
+        select(Product.id).where(Product.id >= probe).order_by(Product.id).limit(1).scalar_subquery()
+        for probe in probes
+    ])).one()
+
+    ids = list(dict.fromkeys(product_id for product_id in row if product_id is not None))[:count]
+    if len(ids) < count:
+        # маленький каталог или сплошные дубли - добираем обычной выборкой
+        extra = (
+            db.session.query(Product.id)
+            .filter(Product.id.notin_(ids))
+            .order_by(func.random())
+            .limit(count - len(ids))
+        )
+        ids += [product_id for product_id, in extra]
+    return ids
+
+
+def _cards_of_day_ids():
+    """id карточек дня; при CARDS_OF_DAY_TTL > 0 выбор держится заданное число секунд"""
+    ttl = current_app.config.get("CARDS_OF_DAY_TTL", 0)
+    now = time.monotonic()
+    if ttl and _cards_cache["ids"] and now < _cards_cache["expires"]:
+        return _cards_cache["ids"]
+
+    ids = _random_product_ids(CARDS_OF_DAY)
+    _cards_cache["ids"] = ids
+    _cards_cache["expires"] = now + ttl
+    return ids
 
 
 @main.route("/")
 def index():
-    products = Product.query.all()
-    random_cards = random.sample(products, min(len(products), 4)) if products else []
+    ids = _cards_of_day_ids()
+    # магазин и категория нужны карточкам, подгружаем их сразу
+    products = Product.query.options(
+        joinedload(Product.store), joinedload(Product.category)
+    ).filter(Product.id.in_(ids)).all() if ids else []
+    by_id = {p.id: p for p in products}
+    random_cards = [by_id[product_id] for product_id in ids if product_id in by_id]
     return render_template("index.html", cards=random_cards)
 
 
 @main.route("/categories")
+@page_cache.cached()
 def categories():
     categories_list = Category.query.order_by(Category.name).all()
     return render_template("categories.html", categories=categories_list)
 
 
 @main.route("/category/<int:category_id>")
+@page_cache.cached(unless=lambda: "rebuild" in request.args)
 def category(category_id):
     category_obj = Category.query.get_or_404(category_id)
-    products = Product.query.filter_by(category_id=category_id).all()
-
-    # группируем товары по нормализованному названию
-    by_norm = {}
-    for p in products:
-        key = _normalize_product_name(p.name)
-        by_norm.setdefault(key, []).append(p)
-
-    # разделяем на товары в обоих магазинах и остальные
-    in_both = []
-    remaining = []
-
-    for key, plist in by_norm.items():
-        stores = {p.store.name for p in plist}
-        if len(stores) >= 2:
-            in_both.append({"name": plist[0].name, "products": plist})
-        else:
-            remaining.extend(plist)
-
-    # ищем похожие товары среди оставшихся
-    similar_groups = []
-    used_ids = set()
-
-    threshold_min = 60
-    threshold_max = 95
-    
-    remaining_sorted = sorted(remaining, key=lambda p: _normalize_product_name(p.name))
-    
-    for i, p1 in enumerate(remaining_sorted):
-        if p1.id in used_ids:
-            continue
-        
-        group = [p1]
-        group_normalized = _normalize_product_name(p1.name)
-        
-        # ищем похожие товары по метрике схожести
-        for p2 in remaining_sorted[i + 1:]:
-            if p2.id in used_ids:
-                continue
-            
-            score = _calculate_similarity(p1.name, p2.name)
-            
-            if threshold_min <= score < threshold_max:
-                group.append(p2)
-                used_ids.add(p2.id)
-                p2_normalized = _normalize_product_name(p2.name)
-                if len(p2_normalized) < len(group_normalized):
-                    group_normalized = p2_normalized
-        
-        # если нашли похожие, группируем по магазинам
-        if len(group) > 1:
-            products_by_store = {}
-            for p in group:
-                store_name = p.store.name
-                if store_name not in products_by_store:
-                    products_by_store[store_name] = []
-                products_by_store[store_name].append(p)
-            
-            group_display_name = min(group, key=lambda p: len(p.name)).name
-            
-            similar_groups.append({
-                "name": group_display_name,
-                "products": group,
-                "products_by_store": products_by_store
-            })
-            for p in group:
-                used_ids.add(p.id)
-
-    # оставшиеся уникальные товары
-    unique_products = [p for p in remaining if p.id not in used_ids]
+
+    # разбиение категории берём из индекса совпадений, который строит merge;
+    # если индекса нет (или запрошена пересборка) - считаем и сохраняем его
+    rebuild = (
+        request.args.get("rebuild") == "1"
+        and current_app.config.get("MATCH_INDEX_ALLOW_REBUILD")
+    )
+    groups = None if rebuild else load_category_groups(category_id)
+    if groups is None:
+        build_match_index(category_id)
+        db.session.commit()
+        groups = load_category_groups(category_id) or ([], [], [])
+
+    in_both, similar_groups, unique_products = groups
 
     return render_template(
         "category.html",
@@ -138,6 +104,23 @@ def category(category_id):
     )
 
 
+@main.route("/basket", methods=["GET", "POST"])
+@page_cache.cached()
+def basket():
+    # список покупок: по позиции в строке, количество - "x2" в конце строки
+    text = request.values.get("items", "")
+    items = parse_basket(text)
+    max_items = current_app.config["BASKET_MAX_ITEMS"]
+    result = optimize_basket(items[:max_items]) if items else None
+    return render_template(
+        "basket.html",
+        text=text,
+        result=result,
+        truncated=len(items) > max_items,
+        max_items=max_items,
+    )
+
+
 @main.route("/about")
 def about():
     return render_template("about.html")
\ No newline at end of file
@@ -1,19 +1,39 @@
-from flask import Blueprint, render_template, request
-from backend.extensions import db
-from backend.models import Product
-from sqlalchemy import func
+from flask import Blueprint, current_app, render_template, request, stream_template
+from backend.extensions import page_cache
+from backend.search_index import parse_cursor, search_products
 
 search_ = (Blueprint('search_', __name__))
 @search_.route('/search')
+@page_cache.cached()
 def search_page():
     query = request.args.get('query', '').strip()
+    config = current_app.config
+
+    # размер страницы ограничен сверху, чтобы широкий запрос не выгружал весь каталог
+    page_size = request.args.get('page_size', config['SEARCH_PAGE_SIZE'], type=int)
+    page_size = max(1, min(page_size, config['SEARCH_MAX_PAGE_SIZE']))
+    after = request.args.get('after', '')
+
     results = []
-    
-    # ищем товары по подстроке в названии (без учёта регистра)
+    next_cursor = None
+    total = 0
+
+    # ищем товары по полнотекстовому индексу (без учёта регистра, по началу слов)
     if query:
-        query_lower = query.lower()
-        results = Product.query.filter(
-            func.lower(Product.name).like(f"%{query_lower}%")
-        ).all()
-    
-    return render_template('results.html', query=query, results=results)
+        results, next_cursor, total = search_products(
+            query, page_size, parse_cursor(after), count_cap=config['SEARCH_COUNT_CAP']
+        )
+
+    context = dict(
+        query=query,
+        results=results,
+        page_size=page_size,
+        next_cursor=next_cursor,
+        total=total,
+        total_cap=config['SEARCH_COUNT_CAP'],
+        is_first_page=not after,
+    )
+    # большие страницы отдаём по частям, не собирая весь HTML в памяти
+    if len(results) >= config['SEARCH_STREAM_MIN_SIZE']:
+        return stream_template('results.html', **context)
+    return render_template('results.html', **context)
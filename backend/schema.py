@@ -0,0 +1,96 @@
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+
+from backend.extensions import db
+from backend.matching import name_keys
+from backend.models import Product
+
+# сколько товаров дополнять одним executemany
+BACKFILL_CHUNK = 1000
+
+
+def _add_missing_columns():
+    """
+    добавляет колонки моделей, которых нет в таблицах старых версий (ALTER TABLE ADD COLUMN)
+    UNIQUE в ADD COLUMN не поддерживается - такой колонке создаётся уникальный индекс uq_*
+    возвращает ["таблица.колонка"]
+    """
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if column.primary_key or (not column.nullable and column.server_default is None):
+                    raise RuntimeError(
+                        f"колонку {table.name}.{column.name} нельзя добавить в существующую таблицу, "
+                        f"соберите БД заново: python -m parsers.merge_to_main_db"
+                    )
+                ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+                if column.unique:
+                    connection.execute(text(
+                        f'CREATE UNIQUE INDEX "uq_{table.name}_{column.name}" ON "{table.name}" ("{column.name}")'
+                    ))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _backfill_name_keys() -> int:
+    """
+    заполняет normalized_name и name_tokens товаров, у которых их нет (БД старой версии)
+    возвращает число дополненных товаров
+    """
+    table = Product.__table__
+    rows = db.session.execute(select(table.c.id, table.c.name).where(table.c.normalized_name.is_(None))).all()
+    statement = (
+        table.update()
+        .where(table.c.id == bindparam("product_id"))
+        .values(normalized_name=bindparam("normalized_name"), name_tokens=bindparam("name_tokens"))
+    )
+    for start in range(0, len(rows), BACKFILL_CHUNK):
+        params = []
+        for product_id, name in rows[start:start + BACKFILL_CHUNK]:
+            normalized_name, name_tokens = name_keys(name)
+            params.append({"product_id": product_id, "normalized_name": normalized_name, "name_tokens": name_tokens})
+        db.session.execute(statement, params)
+    db.session.commit()
+    return len(rows)
+
+
+def upgrade_schema():
+    """
+    доводит схему существующей БД до моделей: создаёт недостающие таблицы (create_all),
+    добавляет колонки, которых нет в таблицах из старых версий, и дополняет нормализованные
+    названия товаров; создаёт недостающие индексы (create_all не трогает уже существующие
+    таблицы) и удаляет индексы ix_*, которых в моделях больше нет
+    ссылки товаров (product.url) и нормализованные названия категорий в старой БД взять
+    неоткуда - их заполнит полное объединение БД
+    после изменений обновляет статистику планировщика (ANALYZE)
+    возвращает {"columns": добавленные колонки, "backfilled": число дополненных товаров,
+    "indexes": созданные индексы}
+    """
+    db.create_all()
+    added = _add_missing_columns()
+    backfilled = _backfill_name_keys()
+
+    inspector = inspect(db.engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        wanted = {index.name for index in table.indexes}
+        # индексы, которые модели заменили другими (ix_ - имена, которые даёт SQLAlchemy)
+        with db.engine.begin() as connection:
+            for name in sorted(existing - wanted):
+                if name.startswith("ix_"):
+                    connection.execute(text(f'DROP INDEX "{name}"'))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    if added or backfilled or created:
+        with db.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+    return {"columns": added, "backfilled": backfilled, "indexes": created}
@@ -0,0 +1,132 @@
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+
+from backend.extensions import db
+from backend.matching import normalize_product_name
+from backend.models import Product
+
+# полнотекстовый индекс по названиям товаров (external content над таблицей product)
+# unicode61 приводит к нижнему регистру и кириллицу; remove_diacritics 0 не
+# превращает "й" в "и"; префиксные индексы ускоряют поиск по началу слова
+FTS_TABLE = "product_fts"
+FTS_TOKENIZER = "unicode61 remove_diacritics 0"
+FTS_PREFIXES = "2 3 4"
+
+
+def fts_available() -> bool:
+    """проверяет, собран ли SQLite с поддержкой FTS5"""
+    rows = db.session.execute(text("PRAGMA compile_options")).scalars()
+    return "ENABLE_FTS5" in set(rows)
+
+
+def rebuild_product_fts() -> bool:
+    """
+    создаёт (при необходимости) и заполняет индекс заново из таблицы product
+    возвращает False, если FTS5 недоступен и поиск будет работать через LIKE
+    """
+    if not fts_available():
+        return False
+
+    db.session.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"name, content='product', content_rowid='id', "
+        f"tokenize='{FTS_TOKENIZER}', prefix='{FTS_PREFIXES}')"
+    ))
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"))
+    db.session.commit()
+    return True
+
+
+def _fts_query(query: str) -> str:
+    """превращает запрос пользователя в выражение MATCH: все слова, каждое как префикс"""
+    tokens = normalize_product_name(query).split()
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def parse_cursor(after: str):
+    """курсор "ранг:id" последнего показанного товара; None, если курсора нет или он битый"""
+    if not after:
+        return None
+    try:
+        rank, product_id = after.split(":", 1)
+        return float(rank), int(product_id)
+    except ValueError:
+        return None
+
+
+def _format_cursor(rank: float, product_id: int) -> str:
+    return f"{rank!r}:{product_id}"
+
+
+def _fts_products(match: str):
+    """запрос товаров по полнотекстовому индексу и выражение ранга BM25"""
+    fts = table(FTS_TABLE, column("rowid"))
+    rank = func.bm25(literal_column(FTS_TABLE))
+    query = (
+        Product.query.join(fts, fts.c.rowid == Product.id)
+        .filter(text(f"{FTS_TABLE} MATCH :match"))
+        .params(match=match)
+    )
+    return query, rank
+
+
+def _like_products(normalized: str):
+    """запасной вариант без FTS5: подстрока в нормализованном названии, ранг у всех 0"""
+    query = Product.query.filter(Product.normalized_name.like(f"%{normalized}%"))
+    return query, literal_column("0.0")
+
+
+def _page(query, rank, limit: int, after):
+    """
+    страница выдачи по ключу (ранг, id): без OFFSET, поэтому дальние
+    страницы стоят столько же, сколько первая
+    возвращает (товары, курсор следующей страницы или None)
+    """
+    if after is not None:
+        after_rank, after_id = after
+        query = query.filter(or_(rank > after_rank, and_(rank == after_rank, Product.id > after_id)))
+
+    rows = (
+        query.options(joinedload(Product.store))
+        .add_columns(rank)
+        .order_by(rank, Product.id)
+        .limit(limit + 1)
+        .all()
+    )
+    products = [product for product, _ in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last_product, last_rank = rows[limit - 1]
+        next_cursor = _format_cursor(last_rank, last_product.id)
+    return products, next_cursor
+
+
+def _count(query, cap: int) -> int:
+    """число совпадений, но не больше cap + 1 (чтобы не считать весь каталог)"""
+    limited = query.with_entities(Product.id).limit(cap + 1).subquery()
+    return db.session.query(func.count()).select_from(limited).scalar()
+
+
+def search_products(query: str, limit: int, after=None, count_cap: int = 0):
+    """
+    ищет товары по запросу, страницами по limit штук после курсора after
+    возвращает (товары, курсор следующей страницы, оценка числа совпадений);
+    оценка не больше count_cap + 1, при count_cap=0 не считается
+    если индекса FTS5 нет, ищет через LIKE
+    """
+    match = _fts_query(query)
+    if not match:
+        return [], None, 0
+
+    try:
+        products_query, rank = _fts_products(match)
+        products, next_cursor = _page(products_query, rank, limit, after)
+    except OperationalError:
+        # нет модуля fts5 или индекс ещё не построен
+        db.session.rollback()
+        products_query, rank = _like_products(normalize_product_name(query))
+        products, next_cursor = _page(products_query, rank, limit, after)
+
+    total = _count(products_query, count_cap) if count_cap else 0
+    return products, next_cursor, total
@@ -0,0 +1,90 @@
+import time
+
+# страница, загруженная не раньше стольких часов назад, при --resume не загружается снова
+FRESH_HOURS = 24
+
+# статусы страниц: pending - ссылка найдена, но страница ещё не загружена;
+# products / subcategories / empty - что нашлось на загруженной странице;
+# unchanged - страница не изменилась с прошлой загрузки и не разбиралась; failed - не загрузилась
+DONE_STATUSES = ("products", "subcategories", "empty", "unchanged")
+
+
+def init_crawl_state(conn):
+    """создаёт таблицу состояния обхода в БД парсера"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_state (
+            url TEXT PRIMARY KEY,
+            parent_url TEXT,
+            level INTEGER,
+            category TEXT,
+            status TEXT NOT NULL,
+            fetched_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_crawl_state_parent ON crawl_state (parent_url)")
+    conn.commit()
+
+
+def record_discovered(conn, parent_url, links):
+    """
+    запоминает ссылки, найденные на странице parent_url: [(уровень, категория, url)]
+    статус уже загруженных страниц не меняется (без commit)
+    """
+    conn.executemany("""
+        INSERT INTO crawl_state (url, parent_url, level, category, status)
+        VALUES (?, ?, ?, ?, 'pending')
+        ON CONFLICT(url) DO UPDATE SET
+            parent_url = excluded.parent_url, level = excluded.level, category = excluded.category
+    """, [(url, parent_url, level, category) for level, category, url in links])
+
+
+def forget_children(conn, parent_url, keep=()):
+    """
+    отвязывает от страницы parent_url ссылки, которых на ней больше нет (все, кроме keep),
+    чтобы продолжение обхода не шло по устаревшим ссылкам (без commit)
+    """
+    keep = [url for url in keep if url]
+    conn.execute(
+        f"UPDATE crawl_state SET parent_url = NULL WHERE parent_url = ? AND url NOT IN ({', '.join('?' * len(keep))})",
+        [parent_url, *keep],
+    )
+
+
+def record_fetched(conn, url, status, level=None, category=None):
+    """отмечает страницу загруженной со статусом status сейчас (без commit)"""
+    conn.execute("""
+        INSERT INTO crawl_state (url, level, category, status, fetched_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET status = excluded.status, fetched_at = excluded.fetched_at
+    """, (url, level, category, status, time.time()))
+
+
+class ResumeState:
+    """
+    снимок состояния прошлого обхода для --resume: какие страницы свежие
+    и какие ссылки были на них найдены; без conn - пустой (обход с нуля),
+    при fresh_hours=None свежих страниц нет, но найденные ссылки известны
+    """
+
+    def __init__(self, conn=None, fresh_hours=FRESH_HOURS):
+        self.fresh = {}
+        self.children = {}
+        if conn is None:
+            return
+        cutoff = time.time() - fresh_hours * 3600 if fresh_hours is not None else float("inf")
+        rows = conn.execute(
+            "SELECT url, parent_url, level, category, status, fetched_at FROM crawl_state ORDER BY rowid"
+        )
+        for url, parent_url, level, category, status, fetched_at in rows:
+            if status in DONE_STATUSES and fetched_at is not None and fetched_at >= cutoff:
+                self.fresh[url] = status
+            if parent_url:
+                self.children.setdefault(parent_url, []).append((level, category, url))
+
+    def status(self, url):
+        """статус свежей страницы или None, если её нужно загрузить"""
+        return self.fresh.get(url)
+
+    def children_of(self, url):
+        """ссылки, найденные на странице в прошлый раз: [(уровень, категория, url)]"""
+        return self.children.get(url, [])
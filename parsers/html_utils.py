@@ -0,0 +1,3 @@
+def has_class(name):
+    """условие XPath: у элемента есть класс name (а не только класс, начинающийся с name)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
@@ -1,11 +1,24 @@
+import argparse
 import os
 import sqlite3
+from collections import namedtuple
+from itertools import chain, islice
 
-from backend.app import app
+from backend.app import app, create_app
+from backend.category_matching import match_categories
 from backend.extensions import db
-from backend.models import Store, Category, Product
-from rapidfuzz import fuzz
-from fuzzywuzzy import fuzz as fw_fuzz
+from backend.matching import (
+    clear_match_index,
+    name_keys,
+    normalize_product_name,
+    rebuild_match_index,
+)
+from backend.models import Store, Category, CategoryMapping, Product, PriceHistory, DatasetVersion
+from backend.price_history import copy_price_history, record_price_changes
+from backend.schema import upgrade_schema
+from backend.search_index import rebuild_product_fts
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.schema import CreateIndex
 
 
 BASE_DIR = os.path.dirname(__file__)
@@ -13,18 +26,43 @@ OKEY_DB_PATH = os.path.join(BASE_DIR, "okey_products.db")
 SVETOFOR_DB_PATH = os.path.join(BASE_DIR, "svetofor_products.db")
 MAIN_DB_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "data", "food_tracker.db"))
 
+# парсерные БД: (источник, путь, таблица)
+SOURCES = (
+    ("okey", OKEY_DB_PATH, "okey_products"),
+    ("svetofor", SVETOFOR_DB_PATH, "svetofor_products"),
+)
 
-def _read_products(db_path: str, table_name: str):
-    """читает все товары из указанной SQLite-БД и таблицы"""
+# размер пачки строк для executemany при загрузке товаров
+BULK_CHUNK_SIZE = 5000
+# сколько строк парсерной БД читать за один fetchmany
+READ_BATCH_SIZE = 5000
+
+# строка парсерной БД и она же после нормализации категории
+ParserRow = namedtuple("ParserRow", "category name price url shop")
+MergeRow = namedtuple("MergeRow", "raw_category category_norm name price url shop")
+
+
+def _read_products(db_path: str, table_name: str, batch_size: int = READ_BATCH_SIZE):
+    """
+    читает товары из указанной SQLite-БД и таблицы потоком, пачками по batch_size,
+    так что в памяти одновременно не больше одной пачки
+    """
     if not os.path.exists(db_path):
         raise FileNotFoundError(f"Не найдена БД: {db_path}")
+    return _iter_products(db_path, table_name, batch_size)
+
 
+def _iter_products(db_path: str, table_name: str, batch_size: int):
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT category, name, price, url, shop FROM {table_name}")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    try:
+        cursor = conn.execute(f"SELECT category, name, price, url, shop FROM {table_name} ORDER BY rowid")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from map(ParserRow._make, batch)
+    finally:
+        conn.close()
 
 
 def _normalize_category(name: str) -> str:
@@ -39,76 +77,407 @@ def _normalize_category(name: str) -> str:
     return norm
 
 
-def merge_databases():
-    """объединяет данные из парсерных БД в основную БД"""
-    # удаляем старую БД перед созданием новой
-    if os.path.exists(MAIN_DB_PATH):
-        os.remove(MAIN_DB_PATH)
-        print(f"🗑 Удалена старая основная БД: {MAIN_DB_PATH}")
-
-    # читаем сырые данные из парсерных БД
-    okey_rows_raw = _read_products(OKEY_DB_PATH, "okey_products")
-    svetofor_rows_raw = _read_products(SVETOFOR_DB_PATH, "svetofor_products")
-
-    # преобразуем строки в словари с нормализованными категориями
-    def _to_dicts(rows):
-        return [
-            {
-                "raw_category": row[0],
-                "category_norm": _normalize_category(row[0]),
-                "name": row[1],
-                "price": row[2],
-                "url": row[3],
-                "shop": row[4],
-            }
-            for row in rows
-        ]
-
-    okey_rows = _to_dicts(okey_rows_raw)
-    svetofor_rows = _to_dicts(svetofor_rows_raw)
-
-    # собираем уникальные нормализованные категории
-    okey_categories_norm_raw = sorted({row["category_norm"] for row in okey_rows if row["category_norm"]})
-    svetofor_categories_norm = sorted({row["category_norm"] for row in svetofor_rows if row["category_norm"]})
-
-    # вычисляем похожесть категорий через несколько алгоритмов
-    def _calculate_category_similarity(cat1: str, cat2: str) -> float:
-        """вычисляет похожесть двух категорий"""
-        scores = [
-            fuzz.ratio(cat1, cat2),
-            fuzz.token_set_ratio(cat1, cat2),
-            fuzz.token_sort_ratio(cat1, cat2),
-            fw_fuzz.ratio(cat1, cat2),
-            fw_fuzz.token_set_ratio(cat1, cat2),
-        ]
-        return max(scores)
-    
-    # убираем дубликаты категорий Окея
-    okey_categories_norm = sorted(set(okey_categories_norm_raw))
-    
-    print(f"Уникальных нормализованных категорий Окей (до объединения): {len(okey_categories_norm_raw)}")
-    print(f"Уникальных нормализованных категорий Окей (после объединения одинаковых): {len(okey_categories_norm)}")
-    
-    # сопоставляем категории Светофора с категориями Окея
-    category_mapping = {}
-
-    for svetofor_norm in svetofor_categories_norm:
-        best_match = None
-        best_score = 0
-        for okey_norm in okey_categories_norm:
-            score = _calculate_category_similarity(svetofor_norm, okey_norm)
-            if score > best_score:
-                best_score = score
-                best_match = okey_norm
-        if best_match and best_score >= 75:
-            category_mapping[svetofor_norm] = best_match
+def _parse_price(value):
+    """цена из парсерной БД или None, если это не число"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_rows(rows, category_mapping=None):
+    """
+    добавляет к строкам парсера нормализованную категорию (генератор)
+    category_mapping переводит категорию в общую (для Светофора - в категорию Окея)
+    """
+    for row in rows:
+        category_norm = _normalize_category(row.category)
+        if category_mapping:
+            category_norm = category_mapping.get(category_norm, category_norm)
+        yield MergeRow(row.category, category_norm, row.name, row.price, row.url, row.shop)
+
+
+def _scan_categories(rows):
+    """
+    нормализованные категории строк и исходное название первой строки каждой
+    (словарь в порядке первого появления)
+    """
+    first_names = {}
+    for row in _to_rows(rows):
+        if row.category_norm and row.category_norm not in first_names:
+            first_names[row.category_norm] = row.raw_category
+    return first_names
+
+
+def _display_names(all_categories_norm, okey_first_names, svetofor_first_names, category_mapping):
+    """
+    название для каждой итоговой категории за один проход: приоритет у Светофора,
+    затем Окей, внутри источника - категория, встретившаяся раньше;
+    если названия нет, берётся нормализованное с заглавных букв
+    """
+    display = {}
+    for svetofor_norm, raw_name in svetofor_first_names.items():
+        display.setdefault(category_mapping[svetofor_norm], raw_name)
+    for okey_norm, raw_name in okey_first_names.items():
+        display.setdefault(okey_norm, raw_name)
+    return {norm_name: display.get(norm_name, norm_name.title()) for norm_name in all_categories_norm}
+
+
+def _remove_db_files(path: str):
+    """удаляет файл SQLite-БД вместе с журналами"""
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _has_merge_keys(db_path: str) -> bool:
+    """
+    заполнены ли в БД ключи инкрементального объединения: ссылки всех товаров (по ним
+    товар находится в парсерной БД) и нормализованные названия всех категорий;
+    в БД старой версии после scripts.migrate_db колонки уже есть, но пустые
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        product_columns = {row[1] for row in conn.execute("PRAGMA table_info(product)")}
+        category_columns = {row[1] for row in conn.execute("PRAGMA table_info(category)")}
+        if "url" not in product_columns or "normalized_name" not in category_columns:
+            return False
+        return not conn.execute("""
+            SELECT EXISTS (SELECT 1 FROM product WHERE url IS NULL)
+                OR EXISTS (SELECT 1 FROM category WHERE normalized_name IS NULL)
+        """).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _load_category_mappings(db_path: str):
+    """
+    сохранённые сопоставления категорий из основной БД
+    возвращает ({категория Светофора: (категория Окея или None, похожесть)},
+    категории Окея, известные на момент сохранения)
+    """
+    if not os.path.exists(db_path):
+        return {}, set()
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT source, source_norm, target_norm, score FROM category_mapping"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # БД из старой версии, таблицы ещё нет
+        return {}, set()
+    finally:
+        conn.close()
+
+    stored = {}
+    known_targets = set()
+    for source, source_norm, target_norm, score in rows:
+        if source == "okey":
+            known_targets.add(source_norm)
         else:
-            category_mapping[svetofor_norm] = svetofor_norm
-
-    # обновляем нормализованные категории в данных Светофора
-    for row in svetofor_rows:
-        if row["category_norm"] in category_mapping:
-            row["category_norm"] = category_mapping[row["category_norm"]]
+            stored[source_norm] = (target_norm, score)
+    return stored, known_targets
+
+
+def _save_category_mappings(okey_categories_norm, svetofor_mapping):
+    """перезаписывает сохранённые сопоставления категорий (без commit)"""
+    db.session.query(CategoryMapping).delete(synchronize_session=False)
+    db.session.add_all(
+        CategoryMapping(source="okey", source_norm=norm, target_norm=norm, score=100.0)
+        for norm in okey_categories_norm
+    )
+    db.session.add_all(
+        CategoryMapping(source="svetofor", source_norm=norm, target_norm=target, score=score)
+        for norm, (target, score) in svetofor_mapping.items()
+    )
+
+
+def _copy_database(src_path: str, dst_path: str):
+    """
+    копирует БД через backup API одной транзакцией: копия согласована, даже если
+    источник кто-то читает, а читатели приёмника видят либо прежние данные, либо новые
+    """
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _sync_stores():
+    """магазины по коду парсера; недостающие создаются"""
+    store_map = {}
+    for code, display_name in (("okey", "Окей"), ("svetofor", "Светофор")):
+        store = Store.query.filter_by(name=display_name).first()
+        if store is None:
+            store = Store(name=display_name)
+            db.session.add(store)
+        store_map[code] = store
+    db.session.flush()
+    return store_map
+
+
+def _sync_categories(display_names):
+    """
+    приводит категории к набору display_names (нормализованное имя -> название)
+    возвращает (категории по нормализованному имени, id удалённых категорий)
+    """
+    existing = {c.normalized_name: c for c in Category.query.all()}
+    category_map = {}
+    for norm_name in sorted(display_names):
+        category = existing.pop(norm_name, None)
+        if category is None:
+            category = Category(name=display_names[norm_name], normalized_name=norm_name, image=None)
+            db.session.add(category)
+        elif category.name != display_names[norm_name]:
+            category.name = display_names[norm_name]
+        category_map[norm_name] = category
+
+    removed_ids = []
+    for category in existing.values():
+        clear_match_index(category.id)
+        removed_ids.append(category.id)
+        db.session.delete(category)
+    db.session.flush()
+    return category_map, removed_ids
+
+
+def _chunks(items, size: int):
+    """режет поток на списки по size элементов"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def set_bulk_pragmas():
+    """
+    настройки SQLite на время загрузки: WAL и без fsync на каждую запись
+    (при сбое временный файл всё равно выбрасывается); вызывать вне транзакции
+    """
+    db.session.execute(text("PRAGMA journal_mode=WAL"))
+    db.session.execute(text("PRAGMA synchronous=OFF"))
+
+
+def bulk_insert_products(connection, params, chunk_size: int = BULK_CHUNK_SIZE) -> int:
+    """вставляет товары пачками через executemany Core, возвращает число строк"""
+    insert_stmt = Product.__table__.insert()
+    count = 0
+    for chunk in _chunks(params, chunk_size):
+        connection.execute(insert_stmt, chunk)
+        count += len(chunk)
+    return count
+
+
+def _sync_products(rows, store_map, category_map):
+    """
+    сверяет товары с данными парсеров по паре (магазин, url):
+    новые добавляет, у изменившихся обновляет цену/название/категорию,
+    пропавшие удаляет вместе с их историей цен; неизменные товары не трогает
+    всё идёт одной транзакцией через Core, без объектов ORM на каждую строку;
+    в пустую таблицу индексы строятся уже после загрузки
+    возвращает (inserted, updated, deleted, id затронутых категорий)
+    """
+    table = Product.__table__
+    connection = db.session.connection()
+    existing = {
+        (row.store_id, row.url): row
+        for row in connection.execute(
+            select(table.c.id, table.c.store_id, table.c.url, table.c.name, table.c.price, table.c.category_id)
+        )
+    }
+    updates = []
+    touched = set()
+
+    def _new_products():
+        for row in rows:
+            store = store_map.get(row.shop)
+            if not store:
+                continue
+
+            cat_obj = category_map.get(row.category_norm)
+            if not cat_obj:
+                continue
+
+            price_value = _parse_price(row.price)
+            if price_value is None:
+                continue
+
+            current = existing.pop((store.id, row.url), None)
+            if current is None:
+                normalized_name, name_tokens = name_keys(row.name)
+                touched.add(cat_obj.id)
+                yield {
+                    "name": row.name,
+                    "normalized_name": normalized_name,
+                    "name_tokens": name_tokens,
+                    "price": price_value,
+                    "url": row.url,
+                    "store_id": store.id,
+                    "category_id": cat_obj.id,
+                }
+            elif (current.price, current.name, current.category_id) != (price_value, row.name, cat_obj.id):
+                normalized_name, name_tokens = name_keys(row.name)
+                touched.update((current.category_id, cat_obj.id))
+                updates.append({
+                    "product_id": current.id,
+                    "name": row.name,
+                    "normalized_name": normalized_name,
+                    "name_tokens": name_tokens,
+                    "price": price_value,
+                    "category_id": cat_obj.id,
+                })
+
+    if existing:
+        inserted = bulk_insert_products(connection, _new_products())
+    else:
+        indexes = list(table.indexes)
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+        inserted = bulk_insert_products(connection, _new_products())
+        for index in indexes:
+            index.create(connection)
+
+    update_stmt = (
+        table.update()
+        .where(table.c.id == bindparam("product_id"))
+        .values(
+            name=bindparam("name"),
+            normalized_name=bindparam("normalized_name"),
+            name_tokens=bindparam("name_tokens"),
+            price=bindparam("price"),
+            category_id=bindparam("category_id"),
+        )
+    )
+    for chunk in _chunks(updates, BULK_CHUNK_SIZE):
+        connection.execute(update_stmt, chunk)
+
+    history = PriceHistory.__table__
+    for chunk in _chunks(existing.values(), BULK_CHUNK_SIZE):
+        touched.update(row.category_id for row in chunk)
+        removed_ids = [row.id for row in chunk]
+        connection.execute(history.delete().where(history.c.product_id.in_(removed_ids)))
+        connection.execute(table.delete().where(table.c.id.in_(removed_ids)))
+
+    db.session.commit()
+    return inserted, len(updates), len(existing), touched
+
+
+def _copy_products_attached(build_path: str, store_map, category_map, category_mapping) -> int:
+    """
+    полная загрузка без цикла Python по строкам: парсерные БД подключаются к новой
+    через ATTACH DATABASE, и товары каждого источника копируются одним INSERT ... SELECT
+    нормализация выполняется функциями Python, зарегистрированными в SQLite
+    возвращает число добавленных товаров
+    """
+    conn = sqlite3.connect(build_path)
+    try:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.create_function("normalize_category", 1, _normalize_category, deterministic=True)
+        conn.create_function("normalize_product_name", 1, normalize_product_name, deterministic=True)
+        conn.create_function("product_name_tokens", 1, lambda name: name_keys(name)[1], deterministic=True)
+        conn.create_function("parse_price", 1, _parse_price, deterministic=True)
+
+        # ATTACH нельзя выполнить внутри транзакции, подключаем источники сразу
+        for source, db_path, _ in SOURCES:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f"Не найдена БД: {db_path}")
+            conn.execute(f"ATTACH DATABASE ? AS src_{source}", (db_path,))
+
+        conn.execute("CREATE TEMP TABLE merge_store (shop TEXT PRIMARY KEY, store_id INTEGER)")
+        conn.execute(
+            "CREATE TEMP TABLE merge_category "
+            "(source TEXT, source_norm TEXT, category_id INTEGER, PRIMARY KEY (source, source_norm))"
+        )
+        conn.executemany(
+            "INSERT INTO merge_store VALUES (?, ?)",
+            [(shop, store.id) for shop, store in store_map.items()],
+        )
+        conn.executemany(
+            "INSERT INTO merge_category VALUES ('okey', ?, ?)",
+            [(norm, category.id) for norm, category in category_map.items()],
+        )
+        conn.executemany(
+            "INSERT INTO merge_category VALUES ('svetofor', ?, ?)",
+            [
+                (svetofor_norm, category_map[okey_norm].id)
+                for svetofor_norm, okey_norm in category_mapping.items()
+                if okey_norm in category_map
+            ],
+        )
+
+        # индексы строим после загрузки
+        indexes = list(Product.__table__.indexes)
+        for index in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+        inserted = 0
+        for source, _, table_name in SOURCES:
+            cursor = conn.execute(
+                f"""
+                INSERT INTO product (name, normalized_name, name_tokens, price, url, store_id, category_id)
+                SELECT src.name, normalize_product_name(src.name), product_name_tokens(src.name),
+                       parse_price(src.price), src.url, s.store_id, c.category_id
+                FROM src_{source}.{table_name} AS src
+                JOIN merge_store AS s ON s.shop = src.shop
+                JOIN merge_category AS c
+                  ON c.source = ? AND c.source_norm = normalize_category(src.category)
+                WHERE parse_price(src.price) IS NOT NULL
+                ORDER BY src.rowid
+                """,
+                (source,),
+            )
+            inserted += cursor.rowcount
+
+        for index in indexes:
+            conn.execute(str(CreateIndex(index).compile(dialect=db.engine.dialect)))
+        conn.commit()
+
+        for source, _, _ in SOURCES:
+            conn.execute(f"DETACH DATABASE src_{source}")
+    finally:
+        conn.close()
+    return inserted
+
+
+def merge_databases(incremental=False, attach=False, one_to_one=False, rematch_categories=False):
+    """
+    объединяет данные из парсерных БД в основную БД
+    новая БД собирается во временном файле и копируется в основную одной транзакцией
+    (backup API), так что сайт всё это время отдаёт прежние данные
+    incremental=True начинает с копии текущей БД и трогает только изменившиеся товары
+    attach=True при полной сборке копирует товары SQL-запросами через ATTACH DATABASE
+    one_to_one=True сопоставляет категории один к одному
+    rematch_categories=True не берёт сохранённые сопоставления категорий, а считает все заново
+    """
+    # первый проход по парсерным БД: нормализованные категории и первое название каждой
+    okey_first_names = _scan_categories(_read_products(OKEY_DB_PATH, "okey_products"))
+    svetofor_first_names = _scan_categories(_read_products(SVETOFOR_DB_PATH, "svetofor_products"))
+
+    okey_categories_norm = sorted(okey_first_names)
+    svetofor_categories_norm = sorted(svetofor_first_names)
+
+    # сопоставляем категории Светофора с категориями Окея;
+    # сохранённые в основной БД сопоставления не пересчитываются
+    stored, known_okey = {}, set()
+    if not rematch_categories:
+        stored, known_okey = _load_category_mappings(MAIN_DB_PATH)
+    svetofor_mapping, scored = match_categories(
+        svetofor_categories_norm,
+        okey_categories_norm,
+        stored=stored,
+        known_targets=known_okey,
+        one_to_one=one_to_one,
+    )
+    category_mapping = {
+        svetofor_norm: target or svetofor_norm
+        for svetofor_norm, (target, _) in svetofor_mapping.items()
+    }
+    print(f"Категорий Светофора сопоставлено заново: {scored}, из сохранённых: {len(svetofor_mapping) - scored}")
 
     # собираем итоговый список всех категорий
     all_categories_norm = set(okey_categories_norm) | set(category_mapping.values())
@@ -121,72 +490,136 @@ def merge_databases():
         print("⚠ Нет категорий для объединения.")
         return
 
-    with app.app_context():
-        db.create_all()
-
-        # создаём магазины в БД
-        store_map = {}
-        for code, display_name in (("okey", "Окей"), ("svetofor", "Светофор")):
-            store = Store(name=display_name)
-            db.session.add(store)
-            store_map[code] = store
-
-        # выбираем название категории из исходных данных
-        def _display_name_for(norm_name: str) -> str:
-            for row in svetofor_rows:
-                if row["category_norm"] == norm_name and row["raw_category"]:
-                    return row["raw_category"]
-            for row in okey_rows:
-                if row["category_norm"] == norm_name and row["raw_category"]:
-                    return row["raw_category"]
-            return norm_name.title()
-
-        # создаём категории в БД
-        category_map = {}
-        for norm_name in sorted(all_categories_norm):
-            display_name = _display_name_for(norm_name)
-            category = Category(name=display_name, image=None)
-            db.session.add(category)
-            category_map[norm_name] = category
-
-        db.session.commit()
-
-        # добавляем товары в БД с проверкой валидности данных
-        def _add_products(rows):
-            for row in rows:
-                norm_cat = row["category_norm"]
-                if not norm_cat or norm_cat not in all_categories_norm:
-                    continue
-
-                store = store_map.get(row["shop"])
-                if not store:
-                    continue
-
-                cat_obj = category_map.get(norm_cat)
-                if not cat_obj:
-                    continue
-
-                try:
-                    price_value = float(row["price"])
-                except (TypeError, ValueError):
-                    continue
-
-                product = Product(
-                    name=row["name"],
-                    price=price_value,
-                    store=store,
-                    category=cat_obj,
-                )
-                db.session.add(product)
-
-        _add_products(okey_rows)
-        _add_products(svetofor_rows)
-
-        db.session.commit()
+    display_names = _display_names(
+        all_categories_norm, okey_first_names, svetofor_first_names, category_mapping
+    )
+
+    # собираем новую БД рядом со старой
+    build_path = MAIN_DB_PATH + ".tmp"
+    _remove_db_files(build_path)
+    if incremental and not (os.path.exists(MAIN_DB_PATH) and _has_merge_keys(MAIN_DB_PATH)):
+        print("⚠ Нет основной БД со ссылками на товары и нормализованными категориями, собираю её заново")
+        incremental = False
+    if incremental:
+        _copy_database(MAIN_DB_PATH, build_path)
+
+    build_app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{build_path}",
+        "CACHE_TYPE": "null",
+    })
+    with build_app.app_context():
+        set_bulk_pragmas()
+        # копия БД старой версии получает недостающие таблицы и индексы
+        upgrade_schema()
+
+        store_map = _sync_stores()
+        category_map, removed_category_ids = _sync_categories(display_names)
+        _save_category_mappings(okey_categories_norm, svetofor_mapping)
+
+        if attach and not incremental:
+            db.session.commit()
+            inserted = _copy_products_attached(build_path, store_map, category_map, category_mapping)
+            updated = deleted = 0
+            touched = set()
+        else:
+            # второй проход потоком: чтение -> нормализация и сопоставление категории -> загрузка
+            rows = chain(
+                _to_rows(_read_products(OKEY_DB_PATH, "okey_products")),
+                _to_rows(_read_products(SVETOFOR_DB_PATH, "svetofor_products"), category_mapping),
+            )
+            inserted, updated, deleted, touched = _sync_products(rows, store_map, category_map)
         print("Данные из парсеров успешно загружены в основную БД")
+        print(f"Товаров добавлено: {inserted}, обновлено: {updated}, удалено: {deleted}")
+
+        # история цен: при полной сборке переносится из прежней БД, затем
+        # дописываются цены, изменившиеся с последней записи
+        if not incremental and os.path.exists(MAIN_DB_PATH):
+            print(f"Записей истории цен перенесено: {copy_price_history(MAIN_DB_PATH)}")
+        print(f"Изменений цен записано в историю: {record_price_changes()}")
+
+        # строим индекс совпадений товаров, чтобы /category не считал его на лету;
+        # при инкрементальном обновлении - только для изменившихся категорий
+        category_ids = None
+        if incremental:
+            category_ids = sorted(touched - set(removed_category_ids) - {None})
+        built = rebuild_match_index(category_ids)
+        print(f"Индекс совпадений построен для категорий: {built}")
+
+        # полнотекстовый индекс для /search
+        if rebuild_product_fts():
+            print("Полнотекстовый индекс товаров построен")
+        else:
+            print("⚠ SQLite без FTS5, поиск будет работать через LIKE")
+
+        # новая версия данных сбрасывает кэш страниц сайта
+        print(f"Версия данных: {DatasetVersion.bump()}")
+        db.session.remove()
+        db.engine.dispose()
+
+    conn = sqlite3.connect(build_path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+    if os.path.exists(MAIN_DB_PATH):
+        # сайт держит основную БД открытой в режиме WAL, и её -wal/-shm относятся к
+        # старому файлу: rename нового файла поверх них может испортить данные;
+        # поэтому страницы новой БД копируются в открытую основную через backup API -
+        # одной транзакцией, читатели до конца своей транзакции видят прежние данные
+        _copy_database(build_path, MAIN_DB_PATH)
+        _remove_db_files(build_path)
+    else:
+        os.replace(build_path, MAIN_DB_PATH)
+    print(f"Основная БД обновлена: {MAIN_DB_PATH}")
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
+
+
+def rebuild_index():
+    """пересобирает индекс совпадений и поисковый индекс в существующей основной БД"""
+    with app.app_context():
+        upgrade_schema()
+        built = rebuild_match_index()
+        print(f"Индекс совпадений построен для категорий: {built}")
+        if rebuild_product_fts():
+            print("Полнотекстовый индекс товаров построен")
+        print(f"Версия данных: {DatasetVersion.bump()}")
 
 
 if __name__ == "__main__":
-    merge_databases()
+    parser = argparse.ArgumentParser(description="объединение парсерных БД в основную")
+    parser.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help="только пересобрать индексы совпадений и поиска, не трогая товары",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="обновить товары в копии текущей БД вместо сборки с нуля",
+    )
+    parser.add_argument(
+        "--attach",
+        action="store_true",
+        help="при полной сборке копировать товары SQL-запросами через ATTACH DATABASE",
+    )
+    parser.add_argument(
+        "--one-to-one-categories",
+        action="store_true",
+        help="сопоставлять категории один к одному (две категории Светофора не сольются в одну)",
+    )
+    parser.add_argument(
+        "--rematch-categories",
+        action="store_true",
+        help="пересчитать сопоставление всех категорий, не беря сохранённое",
+    )
+    args = parser.parse_args()
+
+    if args.rebuild_index:
+        rebuild_index()
+    else:
+        merge_databases(
+            incremental=args.incremental,
+            attach=args.attach,
+            one_to_one=args.one_to_one_categories,
+            rematch_categories=args.rematch_categories,
+        )
 
 
@@ -1,7 +1,15 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
+import lxml.html
+import argparse
+import logging
+import queue
+import threading
 import time
 import sqlite3
 import random
@@ -9,13 +17,39 @@ import sys
 import os
 sys.setrecursionlimit(2000)
 
+try:
+    from parsers.crawl_state import FRESH_HOURS, ResumeState, init_crawl_state, record_discovered, record_fetched
+    from parsers.html_utils import has_class
+except ImportError:  # запуск скриптом из каталога parsers
+    from crawl_state import FRESH_HOURS, ResumeState, init_crawl_state, record_discovered, record_fetched
+    from html_utils import has_class
+
+log = logging.getLogger(__name__)
+
 DB_NAME = 'okey_products.db'
+CATALOG_URL = "https://www.okeydostavka.ru/spb/catalog"
+
+# первые ссылки на странице каталога - не категории товаров
+CATALOG_SKIP_LINKS = 5
+MAX_LEVEL = 3
+
+# страница готова, когда появились товары или ссылки на подкатегории
+READY_SELECTORS = (".grid_mode li .product-name a", ".col-xs-5 h2 a")
+PAGE_READY_TIMEOUT = 20
+# минимальная вежливая пауза между запросами одного браузера, с
+POLITENESS_DELAY = (3, 6)
+# откат при ограничении запросов сайтом: начальная и максимальная пауза, число повторов страницы
+BACKOFF_START = 30
+BACKOFF_MAX = 600
+THROTTLE_RETRIES = 3
+# признаки страницы-заглушки при ограничении запросов
+THROTTLE_MARKERS = ("too many requests", "слишком много запросов", "доступ ограничен", "captcha", "капча")
 
 print("путь к базе данных:", os.path.abspath(DB_NAME))
 
-def initialize_db():
+def initialize_db(db_name=DB_NAME):
     """создает базу данных и таблицу для продуктов"""
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -29,16 +63,20 @@ def initialize_db():
     ''')
 
     conn.commit()
+    init_crawl_state(conn)
     conn.close()
-    print(f"база данных '{DB_NAME}' и таблица 'okey_products' готовы")
+    print(f"база данных '{db_name}' и таблица 'okey_products' готовы")
 
 
-def create_stealth_driver():
+def create_stealth_driver(headless=False):
     """создает настроенный chrome webdriver"""
     options = webdriver.ChromeOptions()
     options.add_argument('--disable-blink-features=AutomationControlled')
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if headless:
+        options.add_argument('--headless=new')
+        options.add_argument('--window-size=1920,1080')
 
     driver = webdriver.Chrome(
         service=Service(ChromeDriverManager().install()),
@@ -63,133 +101,413 @@ def get_category_links(driver):
     return category_links
 
 
-def parse_products_on_page(driver, category_name):
-    """парсит товары на странице и записывает в БД"""
+def wait_page_ready(driver, timeout=PAGE_READY_TIMEOUT):
+    """ждёт появления товаров или ссылок на категории; False - не дождались"""
+    try:
+        WebDriverWait(driver, timeout).until(EC.any_of(*(
+            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            for selector in READY_SELECTORS
+        )))
+        return True
+    except TimeoutException:
+        return False
 
-    all_li = driver.find_elements(By.CSS_SELECTOR, ".grid_mode li")
-    valid_products = []
 
-    for li in all_li:
-        try:
-            li.find_element(By.CSS_SELECTOR, ".product-name a")
-            valid_products.append(li)
-        except:
+def is_throttled(driver):
+    """похожа ли открытая страница на заглушку ограничения запросов"""
+    text = f"{driver.title} {driver.page_source}".lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+class Politeness:
+    """
+    вежливость одного браузера: между запросами проходит не меньше POLITENESS_DELAY
+    (время загрузки страницы засчитывается), при ограничении запросов пауза растёт
+    вдвое до BACKOFF_MAX и уменьшается после удачных страниц
+    """
+
+    def __init__(self, delay_scale=1.0):
+        self.delay_scale = delay_scale
+        self.backoff = 0
+        self._last_start = None
+
+    def before_request(self):
+        """выжидает паузу перед запросом, возвращает её длину"""
+        delay = (random.uniform(*POLITENESS_DELAY) + self.backoff) * self.delay_scale
+        if self._last_start is not None:
+            delay -= time.perf_counter() - self._last_start
+        delay = max(0.0, delay)
+        time.sleep(delay)
+        self._last_start = time.perf_counter()
+        return delay
+
+    def throttled(self):
+        self.backoff = min(BACKOFF_MAX, max(BACKOFF_START, self.backoff * 2))
+
+    def succeeded(self):
+        self.backoff = self.backoff // 2 if self.backoff > BACKOFF_START else 0
+
+
+class PageTimings:
+    """сколько времени браузеры тратят на загрузку, ожидание готовности и паузы"""
+
+    def __init__(self):
+        self.pages = 0
+        self.skipped = 0
+        self.load = 0.0
+        self.wait = 0.0
+        self.sleep = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, load, wait, sleep):
+        with self._lock:
+            self.pages += 1
+            self.load += load
+            self.wait += wait
+            self.sleep += sleep
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def summary(self):
+        total = self.load + self.wait + self.sleep
+        share = self.sleep / total * 100 if total else 0
+        return (f"страниц {self.pages}: загрузка {self.load:.0f} с, ожидание готовности {self.wait:.0f} с, "
+                f"паузы {self.sleep:.0f} с ({share:.0f}% времени); пропущено свежих страниц: {self.skipped}")
+
+
+def load_page(driver, url, politeness, timings, worker_id):
+    """
+    открывает страницу и ждёт её готовности, при ограничении запросов
+    повторяет с растущей паузой; False - страницу так и не удалось получить
+    """
+    for attempt in range(THROTTLE_RETRIES + 1):
+        slept = politeness.before_request()
+        started = time.perf_counter()
+        driver.get(url)
+        loaded = time.perf_counter()
+        ready = wait_page_ready(driver)
+        waited = time.perf_counter() - loaded
+        timings.add(loaded - started, waited, slept)
+        print(f"[{worker_id}] загрузка {loaded - started:.1f} с, ожидание {waited:.1f} с, пауза {slept:.1f} с")
+
+        # без товаров и ссылок страница бывает и честно пустой
+        if ready or not is_throttled(driver):
+            politeness.succeeded()
+            return True
+        if attempt == THROTTLE_RETRIES:
+            break
+        # пауза растёт только перед повтором: после последней попытки повтора не будет
+        politeness.throttled()
+        print(f"[{worker_id}] сайт ограничивает запросы, повтор {attempt + 1}/{THROTTLE_RETRIES} "
+              f"после паузы {politeness.backoff * politeness.delay_scale:.0f} с")
+    print(f"[{worker_id}] сайт ограничивает запросы, страница не получена после {THROTTLE_RETRIES} повторов: {url}")
+    return False
+
+
+# товары страницы одним вызовом JavaScript: [название, ссылка, цена] для каждого li с товаром
+EXTRACT_PRODUCTS_JS = """
+return Array.from(document.querySelectorAll('.grid_mode li')).map(function (li) {
+    var link = li.querySelector('.product-name a');
+    if (!link) { return null; }
+    var price = li.querySelector('input[type="hidden"][id^="ProductInfoPrice_"]');
+    return [link.innerText.trim(), link.href, price ? price.value : null];
+}).filter(Boolean);
+"""
+
+
+def _product_rows_js(driver):
+    """все товары страницы одним execute_script"""
+    return [tuple(row) for row in driver.execute_script(EXTRACT_PRODUCTS_JS)]
+
+
+def _product_rows_lxml(driver):
+    """все товары страницы разбором page_source через lxml, без обращений к браузеру за элементами"""
+    tree = lxml.html.fromstring(driver.page_source)
+    tree.make_links_absolute(driver.current_url)
+    rows = []
+    for li in tree.xpath(f"//*[{has_class('grid_mode')}]//li"):
+        links = li.xpath(f".//*[{has_class('product-name')}]//a")
+        if not links:
             continue
+        prices = li.xpath('.//input[@type="hidden"][starts-with(@id, "ProductInfoPrice_")]/@value')
+        rows.append((links[0].text_content().strip(), links[0].get("href"), prices[0] if prices else None))
+    return rows
 
-    print(f"    найдено товаров: {len(valid_products)}")
 
-    if not valid_products:
-        return False
-
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    products_to_insert = []
-
-    for j, product in enumerate(valid_products):
+def _product_rows_dom(driver):
+    """прежний способ: несколько обращений к WebDriver на каждый товар"""
+    rows = []
+    for li in driver.find_elements(By.CSS_SELECTOR, ".grid_mode li"):
         try:
-            name_link = product.find_element(By.CSS_SELECTOR, ".product-name a")
-            name = name_link.text.strip()
-            product_url = name_link.get_attribute("href")
-
-            price_input_element = product.find_element(
-                By.CSS_SELECTOR, 'input[type="hidden"][id^="ProductInfoPrice_"]'
-            )
-            price_raw = price_input_element.get_attribute('value')
-            print(f"начальный вид цены: {price_raw}")
-            price = price_raw.replace('\u00A0', '').replace(' ', '').replace('\u2009', '')
-            price = price.replace('₽', '').replace(',', '.').strip()
-            print(f"итоговый вид цены: {price}")
-
-            try:
-                price_float = float(price)
-            except ValueError:
-                print(f"        {j + 1}. ошибка: не удалось преобразовать цену '{price_raw}' в число, пропускаю товар")
-                continue
-
-            products_to_insert.append((category_name, name, price_float, product_url, 'okey'))
-
-        except Exception as e:
-            print(f"        {j + 1}. ошибка парсинга товара: {e}")
+            name_link = li.find_element(By.CSS_SELECTOR, ".product-name a")
+        except Exception:
             continue
-
-    if products_to_insert:
         try:
-            before = conn.total_changes
-            cursor.executemany(
-                '''INSERT OR IGNORE INTO okey_products (category, name, price, url, shop) 
-                   VALUES (?, ?, ?, ?, ?)''', products_to_insert)
-            conn.commit()
-            inserted = conn.total_changes - before
-            print(f"    записано {inserted} новых товаров в БД")
-        except Exception as e:
-            print(f"    ошибка при записи в БД: {e}")
-
-    conn.close()
-    return True
-
-
-initialize_db()
-
-driver = create_stealth_driver()
-try:
-    print("открываю главную страницу каталога")
-    driver.get("https://www.okeydostavka.ru/spb/catalog")
-    time.sleep(random.uniform(3, 5))
+            price_raw = li.find_element(
+                By.CSS_SELECTOR, 'input[type="hidden"][id^="ProductInfoPrice_"]'
+            ).get_attribute('value')
+        except Exception:
+            price_raw = None
+        rows.append((name_link.text.strip(), name_link.get_attribute("href"), price_raw))
+    return rows
+
+
+EXTRACTORS = {"js": _product_rows_js, "lxml": _product_rows_lxml, "dom": _product_rows_dom}
+DEFAULT_EXTRACT = "js"
+
+
+def _parse_price(price_raw):
+    """цена из скрытого поля ("1 249,90 ₽") числом; None - если не число"""
+    if price_raw is None:
+        return None
+    price = price_raw.replace('\u00A0', '').replace(' ', '').replace('\u2009', '')
+    price = price.replace('₽', '').replace(',', '.').strip()
+    try:
+        return float(price)
+    except ValueError:
+        return None
+
+
+def extract_products(driver, category_name, mode=DEFAULT_EXTRACT):
+    """
+    собирает товары со страницы: список (category, name, price, url, shop)
+    mode - способ извлечения: js (один execute_script), lxml (разбор page_source)
+    или dom (по элементу, медленно)
+    """
+    rows = EXTRACTORS[mode](driver)
+    print(f"    найдено товаров: {len(rows)}")
+
+    products = []
+    for j, (name, product_url, price_raw) in enumerate(rows):
+        price = _parse_price(price_raw)
+        if price is None:
+            print(f"        {j + 1}. ошибка: не удалось преобразовать цену '{price_raw}' в число, пропускаю товар")
+            continue
+        log.debug("%s: %s, цена %r -> %s, %s", category_name, name, price_raw, price, product_url)
+        products.append((category_name, name, price, product_url, 'okey'))
 
-    all_category_links = get_category_links(driver)
-    main_category_urls = all_category_links[5:]
+    return products
 
-    print(f"найдено основных категорий (уровень 1): {len(main_category_urls)}")
-    print("-" * 50)
 
-    for i, (main_category_name, main_category_url) in enumerate(main_category_urls, start=1):
+def save_products(conn, products):
+    """
+    записывает товары в БД, возвращает число новых; у известных товаров
+    обновляются изменившиеся цена, название и категория
+    без commit: транзакцией владеет вызывающий, ошибка SQLite пробрасывается
+    """
+    cursor = conn.cursor()
+    urls = {product[3] for product in products}
+    known = {
+        url for (url,) in conn.execute(
+            f"SELECT url FROM okey_products WHERE url IN ({', '.join('?' * len(urls))})", list(urls)
+        )
+    } if urls else set()
+    before = conn.total_changes
+    cursor.executemany(
+        '''INSERT INTO okey_products (category, name, price, url, shop)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT(url) DO UPDATE SET
+               category = excluded.category, name = excluded.name, price = excluded.price, shop = excluded.shop
+           WHERE price IS NOT excluded.price OR name IS NOT excluded.name
+               OR category IS NOT excluded.category''', products)
+    inserted = len(urls - known)
+    updated = conn.total_changes - before - inserted
+    print(f"    записано {inserted} новых товаров в БД, обновлено {updated}")
+    return inserted
+
+
+class DbWriter(threading.Thread):
+    """
+    единственный поток, который пишет в БД: воркеры передают ему через очередь
+    (url, уровень, категория, статус, товары, найденные ссылки); товары и состояние
+    страницы записываются одной транзакцией, так что после сбоя --resume не пропустит
+    страницу, товары которой не успели сохраниться; если запись не удалась, транзакция
+    откатывается и страница отмечается failed - следующий обход загрузит её снова
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        super().__init__(daemon=True)
+        self.db_name = db_name
+        self.queue = queue.Queue()
+        self.inserted = 0
+
+    def run(self):
+        conn = sqlite3.connect(self.db_name)
         try:
-            print(f"уровень 1: обрабатываю категорию {i}: {main_category_name}")
-            driver.get(main_category_url)
-            time.sleep(random.uniform(15, 25))
-
-            products_found = parse_products_on_page(driver, main_category_name)
-
-            if not products_found:
-                sub_category_urls = get_category_links(driver)
-                print(f"  найдено подкатегорий (уровень 2): {len(sub_category_urls)}")
-
-                for j, (sub_category_name, sub_category_url) in enumerate(sub_category_urls, start=1):
-                    try:
-                        full_category_name_2 = f"{main_category_name} / {sub_category_name}"
-                        print(f"уровень 2: обрабатываю подкатегорию {j}: {full_category_name_2}")
-                        driver.get(sub_category_url)
-                        time.sleep(random.uniform(10, 18))
-
-                        products_found_2 = parse_products_on_page(driver, full_category_name_2)
-
-                        if not products_found_2:
-                            inner_sub_category_urls = get_category_links(driver)
-                            print(f"    найдено внутренних подкатегорий (уровень 3): {len(inner_sub_category_urls)}")
-
-                            for k, (inner_sub_category_name, inner_sub_category_url) in enumerate(
-                                    inner_sub_category_urls, start=1):
-                                try:
-                                    full_category_name_3 = f"{full_category_name_2} / {inner_sub_category_name}"
-                                    print(f"уровень 3: обрабатываю внутреннюю подкатегорию {k}: {inner_sub_category_name}")
-                                    driver.get(inner_sub_category_url)
-                                    time.sleep(random.uniform(8, 15))
-
-                                    parse_products_on_page(driver, full_category_name_3)
-
-                                except Exception as e:
-                                    print(f"ошибка во внутренней подкатегории {k}: {e}")
-                                    continue
-
-                    except Exception as e:
-                        print(f"ошибка в подкатегории {j}: {e}")
-                        continue
-
-        except Exception as e:
-            print(f"ошибка в основной категории {i}: {e}")
-            continue
-
-finally:
-    print("\nскрипт завершен, закрываю драйвер")
-    driver.quit()
\ No newline at end of file
+            while True:
+                page = self.queue.get()
+                if page is None:
+                    break
+                url, level, category, status, products, links = page
+                try:
+                    record_discovered(conn, url, links)
+                    record_fetched(conn, url, status, level, category)
+                    inserted = save_products(conn, products) if products else 0
+                    conn.commit()
+                    self.inserted += inserted
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    print(f"    ошибка при записи в БД ({url}): {e}")
+                    self._record_failed(conn, url, level, category)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _record_failed(conn, url, level, category):
+        """отмечает страницу failed отдельной транзакцией после отката"""
+        try:
+            record_fetched(conn, url, "failed", level, category)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"    не удалось отметить страницу {url}: {e}")
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
+
+
+def crawl_worker(worker_id, tasks, writer, headless, delay_scale, driver_factory, timings, extract, resume):
+    """
+    воркер со своим драйвером: берёт из общей очереди (уровень, категория, url),
+    загружает страницу с вежливой паузой и либо отдаёт товары писателю,
+    либо кладёт в очередь найденные подкатегории;
+    свежие по resume страницы не загружает, а берёт их подкатегории из прошлого обхода
+    """
+    politeness = Politeness(delay_scale)
+    try:
+        driver = driver_factory(headless)
+    except Exception as e:
+        print(f"[{worker_id}] не удалось запустить браузер: {e}")
+        return
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                tasks.task_done()
+                break
+            level, category_name, url = task
+            try:
+                status = resume.status(url)
+                if status is not None:
+                    timings.skip()
+                    print(f"[{worker_id}] уровень {level}: {category_name or url} - свежая, пропускаю")
+                    if status == "subcategories":
+                        for child in resume.children_of(url):
+                            tasks.put(child)
+                    continue
+
+                print(f"[{worker_id}] уровень {level}: {category_name or url}")
+                if not load_page(driver, url, politeness, timings, worker_id):
+                    print(f"[{worker_id}] пропускаю страницу {url}")
+                    writer.queue.put((url, level, category_name, "failed", [], []))
+                    continue
+
+                products = []
+                children = []
+                if level == 0:
+                    links = get_category_links(driver)[CATALOG_SKIP_LINKS:]
+                    print(f"найдено основных категорий (уровень 1): {len(links)}")
+                    children = [(1, name, link) for name, link in links]
+                else:
+                    products = extract_products(driver, category_name, extract)
+                    if not products and level < MAX_LEVEL:
+                        links = get_category_links(driver)
+                        print(f"  [{worker_id}] найдено подкатегорий (уровень {level + 1}): {len(links)}")
+                        children = [(level + 1, f"{category_name} / {name}", link) for name, link in links]
+
+                status = "products" if products else "subcategories" if children else "empty"
+                writer.queue.put((url, level, category_name, status, products, children))
+                for child in children:
+                    tasks.put(child)
+            except Exception as e:
+                print(f"[{worker_id}] ошибка на странице {url}: {e}")
+            finally:
+                tasks.task_done()
+    finally:
+        driver.quit()
+
+
+def crawl(start_url=CATALOG_URL, db_name=DB_NAME, workers=1, headless=False, delay_scale=1.0,
+          driver_factory=create_stealth_driver, extract=DEFAULT_EXTRACT, resume=False, fresh_hours=FRESH_HOURS):
+    """
+    обходит дерево категорий пулом из workers драйверов
+    resume=True пропускает страницы, загруженные не раньше fresh_hours часов назад
+    возвращает число новых товаров в БД
+    """
+    resume_state = ResumeState()
+    if resume:
+        conn = sqlite3.connect(db_name)
+        resume_state = ResumeState(conn, fresh_hours)
+        conn.close()
+        print(f"продолжаю обход: свежих страниц {len(resume_state.fresh)}")
+
+    tasks = queue.Queue()
+    timings = PageTimings()
+    writer = DbWriter(db_name)
+    writer.start()
+
+    tasks.put((0, None, start_url))
+    threads = [
+        threading.Thread(
+            target=crawl_worker,
+            args=(i + 1, tasks, writer, headless, delay_scale, driver_factory, timings, extract, resume_state),
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    # очередь пуста и все взятые страницы обработаны - обход закончен
+    done = threading.Event()
+    threading.Thread(target=lambda: (tasks.join(), done.set()), daemon=True).start()
+    try:
+        while not done.wait(1):
+            if not any(thread.is_alive() for thread in threads):
+                print("ни одного работающего браузера, обход прерван")
+                break
+    finally:
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+        writer.close()
+        print(timings.summary())
+    return writer.inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="парсер каталога Окей")
+    parser.add_argument("--start-url", default=CATALOG_URL, help="страница каталога (можно file:// с фикстурами)")
+    parser.add_argument("--db", default=DB_NAME, help="файл SQLite для товаров")
+    parser.add_argument("--workers", type=int, default=1, help="число браузеров, обходящих каталог параллельно")
+    parser.add_argument("--headless", action="store_true", help="запускать Chrome без окна")
+    parser.add_argument("--delay-scale", type=float, default=1.0,
+                        help="множитель вежливых пауз (0 - без пауз, для фикстур)")
+    parser.add_argument("--extract", choices=sorted(EXTRACTORS), default=DEFAULT_EXTRACT,
+                        help="способ извлечения товаров со страницы")
+    parser.add_argument("--debug", action="store_true", help="печатать каждый найденный товар")
+    parser.add_argument("--resume", action="store_true",
+                        help="продолжить прошлый обход, не загружая свежие страницы")
+    parser.add_argument("--fresh-hours", type=float, default=FRESH_HOURS,
+                        help="сколько часов страница считается свежей для --resume")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(message)s")
+    if args.debug:
+        log.setLevel(logging.DEBUG)
+    initialize_db(args.db)
+    started = time.perf_counter()
+    try:
+        inserted = crawl(args.start_url, args.db, args.workers, args.headless, args.delay_scale,
+                         extract=args.extract, resume=args.resume, fresh_hours=args.fresh_hours)
+    finally:
+        print("\nскрипт завершен, драйверы закрыты")
+    print(f"новых товаров: {inserted} за {time.perf_counter() - started:.0f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,58 @@
-import requests
+import argparse
+import asyncio
+import hashlib
+import random
 import sqlite3
-from bs4 import BeautifulSoup
+import time
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+import lxml.etree
+import lxml.html
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:  # selectolax необязателен, без него есть lxml
+    SelectolaxParser = None
+
+try:
+    from parsers.crawl_state import (
+        FRESH_HOURS, ResumeState, forget_children, init_crawl_state, record_discovered, record_fetched,
+    )
+    from parsers.html_utils import has_class
+except ImportError:  # запуск скриптом из каталога parsers
+    from crawl_state import (
+        FRESH_HOURS, ResumeState, forget_children, init_crawl_state, record_discovered, record_fetched,
+    )
+    from html_utils import has_class
 
 DB_NAME = "svetofor_products.db"
-def initialize_db():
+BASE_URL = "https://svetofornadom.ru"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+}
+
+# сколько запросов выполняется одновременно
+CONCURRENCY = 8
+# не больше стольких запросов в секунду к одному хосту
+HOST_RATE = 4.0
+# повторы при ошибках сети, 429 и 5xx: пауза BACKOFF_BASE * 2**попытка + случайная добавка;
+# Retry-After сервера принимается, но не дольше BACKOFF_BASE * 2**RETRIES
+RETRIES = 4
+BACKOFF_BASE = 1.0
+REQUEST_TIMEOUT = 30
+
+# ответ на запрос страницы: код (200 или 304), текст, валидаторы и хэш тела
+PageResult = namedtuple("PageResult", "status text etag last_modified content_hash")
+# загруженная страница категории для записи в БД вместе с товарами
+PageRecord = namedtuple("PageRecord", "url category status next_url etag last_modified content_hash")
+
+
+def initialize_db(db_name=DB_NAME):
     """Создаёт таблицу, если её ещё нет."""
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -18,75 +65,479 @@ def initialize_db():
         )
     """)
 
+    # валидаторы страниц для условных запросов и хэш тела, чтобы не разбирать неизменившиеся,
+    # и ссылка на следующую страницу выдачи, найденная при последнем разборе
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS page_validators (
+            url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            next_url TEXT
+        )
+    """)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(page_validators)")}
+    if "next_url" not in columns:
+        # у валидаторов прежней версии нет ссылки на следующую страницу: без неё по ним
+        # нельзя пропустить разбор, поэтому все страницы один раз разбираются заново
+        cursor.execute("ALTER TABLE page_validators ADD COLUMN next_url TEXT")
+        cursor.execute("DELETE FROM page_validators")
+
     conn.commit()
+    init_crawl_state(conn)
     conn.close()
     print("База данных готова.")
 
-def save_products(products):
+
+def load_validators(db_name=DB_NAME):
+    """{url: (etag, last_modified, content_hash, next_url)} страниц прошлого обхода"""
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute("SELECT url, etag, last_modified, content_hash, next_url FROM page_validators")
+        return {url: tuple(values) for url, *values in rows}
+    finally:
+        conn.close()
+
+
+def save_products(products, db_name=DB_NAME, pages=()):
     """
     Сохраняет список товаров в SQLite.
     products — список кортежей (category, name, price, url, shop)
+    pages — загруженные страницы (PageRecord): их состояние и валидаторы
+    пишутся в той же транзакции, что и товары
     """
-    if not products:
+    if not products and not pages:
         print("Нет данных для записи.")
         return 0
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
     try:
+        for page in pages:
+            if page.status != "failed":
+                # у страницы одна следующая: прежняя ссылка (выдача сократилась
+                # или ссылка поменялась) больше не ведёт из неё
+                forget_children(conn, page.url, [page.next_url])
+            if page.next_url:
+                record_discovered(conn, page.url, [(1, page.category, page.next_url)])
+            record_fetched(conn, page.url, page.status, 1, page.category)
+            if page.content_hash:
+                cursor.execute("""
+                    INSERT OR REPLACE INTO page_validators (url, etag, last_modified, content_hash, next_url)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (page.url, page.etag, page.last_modified, page.content_hash, page.next_url))
+        urls = {product[3] for product in products}
+        known = {
+            url for (url,) in conn.execute(
+                f"SELECT url FROM svetofor_products WHERE url IN ({', '.join('?' * len(urls))})", list(urls)
+            )
+        } if urls else set()
         before = conn.total_changes
+        # уже известный товар обновляется, если поменялись цена, название или категория,
+        # чтобы объединение БД увидело новую цену и записало её в историю
         cursor.executemany("""
-            INSERT OR IGNORE INTO svetofor_products (category, name, price, url, shop)
+            INSERT INTO svetofor_products (category, name, price, url, shop)
             VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                category = excluded.category, name = excluded.name, price = excluded.price, shop = excluded.shop
+            WHERE price IS NOT excluded.price OR name IS NOT excluded.name OR category IS NOT excluded.category
         """, products)
         conn.commit()
-        inserted = conn.total_changes - before
-        print(f"Добавлено новых записей: {inserted}")
+        inserted = len(urls - known)
+        updated = conn.total_changes - before - inserted
+        print(f"Добавлено новых записей: {inserted}, обновлено: {updated}")
     except Exception as e:
         print(f"Ошибка SQLite: {e}")
         inserted = 0
     conn.close()
     return inserted
 
-initialize_db()
-base_url = "https://svetofornadom.ru"
-catalog_url = base_url + "/catalog/"
-headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
-}
 
-# получаем список всех категорий с главной страницы каталога
-response = requests.get(catalog_url, headers=headers)
-soup = BeautifulSoup(response.text, "lxml")
-categories_block = soup.find('div', class_='section-links__list')
-category_links = categories_block.find_all('a', href=True)
-
-# обходим каждую категорию и парсим товары
-for cat in category_links:
-    cat_name = cat.get_text(strip=True)
-    cat_url = base_url + cat['href']
-    print(f"\n--- Категория: {cat_name} ---")
-    
-    # загружаем страницу категории
-    response_cat = requests.get(cat_url, headers=headers)
-    soup_cat = BeautifulSoup(response_cat.text, "lxml")
-    products_container = soup_cat.find("div", class_="cards__list")
-    if not products_container:
-        print("Нет товаров в этой категории.")
-        continue
-    
-    # извлекаем данные из карточек товаров
-    products_to_save = []
-    cards = products_container.find_all("div", class_="card")
-    for card in cards:
-        title_tag = card.find(class_="card__title")
-        price_tag = card.find(class_="card__price")
-        name = title_tag.get_text(strip=True) if title_tag else ""
-        price = float(price_tag.get_text(strip=True).replace("\xa0", "")[:-5]) if price_tag else ""
-        link_tag = card.find("a", href=True)
-        url = base_url + link_tag["href"] if link_tag else ""
-        products_to_save.append((cat_name, name, price, url, "svetofor"))
-        print((cat_name, name, price, url, "svetofor"))
-    
-    # сохраняем все товары категории в БД
-    save_products(products_to_save)
+class HostRateLimiter:
+    """
+    ограничение частоты запросов к каждому хосту: старты запросов к одному
+    хосту разнесены не меньше чем на 1 / rate секунд
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate else 0.0
+        self._next_start = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.interval
+        await asyncio.sleep(start - now)
+
+
+def _retry_delay(attempt: int, backoff: float, retries: int, retry_after=None) -> float:
+    """
+    пауза перед повтором: Retry-After сервера или экспоненциальная с добавкой
+    Retry-After ограничен самой долгой экспоненциальной паузой, чтобы сервер не остановил обход
+    """
+    if retry_after is not None:
+        try:
+            return min(max(float(retry_after), 0.0), backoff * 2 ** retries)
+        except ValueError:
+            pass
+    return backoff * 2 ** attempt + random.uniform(0, backoff)
+
+
+class Fetcher:
+    """
+    загрузка страниц через общий пул соединений aiohttp: не больше concurrency
+    запросов одновременно, ограничение частоты по хостам и повторы
+    при ошибке сети, тайм-ауте, 429 и 5xx
+    """
+
+    def __init__(self, session, concurrency=CONCURRENCY, rate=HOST_RATE,
+                 retries=RETRIES, backoff=BACKOFF_BASE):
+        self.session = session
+        self.limiter = HostRateLimiter(rate)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.retries = retries
+        self.backoff = backoff
+
+    async def fetch(self, url):
+        """текст страницы; None - если все попытки неудачны"""
+        result = await self.fetch_page(url)
+        return result.text if result else None
+
+    async def fetch_page(self, url, etag=None, last_modified=None):
+        """
+        загружает страницу условным запросом по валидаторам прошлой загрузки
+        возвращает PageResult (status 304 - страница не изменилась, тела нет)
+        или None, если все попытки неудачны
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            # очередь к хосту ждём до семафора: ожидающий своей очереди запрос не занимает место
+            await self.limiter.wait(url)
+            async with self.semaphore:
+                try:
+                    async with self.session.get(url, headers=headers) as response:
+                        if response.status == 304:
+                            return PageResult(304, None, etag, last_modified, None)
+                        if response.status == 429 or response.status >= 500:
+                            retry_after = response.headers.get("Retry-After")
+                            error = f"HTTP {response.status}"
+                        elif response.status != 200:
+                            print(f"Страница {url}: HTTP {response.status}")
+                            return None
+                        else:
+                            body = await response.read()
+                            return PageResult(
+                                200,
+                                await response.text(),
+                                response.headers.get("ETag"),
+                                response.headers.get("Last-Modified"),
+                                hashlib.sha1(body).hexdigest(),
+                            )
+                except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError) as e:
+                    error = repr(e)
+
+            if attempt == self.retries:
+                print(f"Не удалось загрузить {url}: {error}")
+                return None
+            delay = _retry_delay(attempt, self.backoff, self.retries, retry_after)
+            print(f"Повтор {attempt + 1}/{self.retries} для {url} через {delay:.1f} с ({error})")
+            await asyncio.sleep(delay)
+
+
+def parse_category_links(html, base_url):
+    """ссылки на категории со страницы каталога: [(название, url)]"""
+    soup = BeautifulSoup(html, "lxml")
+    categories_block = soup.find('div', class_='section-links__list')
+    if not categories_block:
+        return []
+    return [
+        (cat.get_text(strip=True), urljoin(base_url, cat['href']))
+        for cat in categories_block.find_all('a', href=True)
+    ]
+
+
+def _card_price(price_text):
+    """цена из текста карточки ("89.90 ₽/шт"): "" - цены в карточке нет, None - не число ("Нет в наличии")"""
+    if price_text is None:
+        return ""
+    try:
+        return float(price_text.replace("\xa0", "")[:-5])
+    except ValueError:
+        return None
+
+
+def _card_product(cat_name, base_url, name, price_text, href):
+    """кортеж товара из текста карточки (None - элемента в карточке нет)"""
+    price = _card_price(price_text)
+    url = base_url + href if href is not None else ""
+    return (cat_name, name if name is not None else "", price, url, "svetofor")
+
+
+# разбор страницы категории: каждый способ возвращает
+# ([(название, цена, ссылка) карточки - текст или None], ссылка на следующую страницу или None)
+
+def _cards_bs4(soup):
+    next_link = soup.select_one('a[rel="next"][href], link[rel="next"][href]')
+    products_container = soup.find("div", class_="cards__list")
+    cards = []
+    if products_container:
+        for card in products_container.find_all("div", class_="card"):
+            title_tag = card.find(class_="card__title")
+            price_tag = card.find(class_="card__price")
+            link_tag = card.find("a", href=True)
+            cards.append((
+                title_tag.get_text(strip=True) if title_tag else None,
+                price_tag.get_text(strip=True) if price_tag else None,
+                link_tag["href"] if link_tag else None,
+            ))
+    return cards, next_link["href"] if next_link else None
+
+
+def _parse_bs4(html):
+    """полное дерево BeautifulSoup (прежний способ)"""
+    return _cards_bs4(BeautifulSoup(html, "lxml"))
+
+
+# SoupStrainer оставляет от страницы только список карточек и ссылку на следующую страницу
+CARDS_STRAINER = SoupStrainer("div", class_="cards__list")
+NEXT_STRAINER = SoupStrainer(["a", "link"], rel="next")
+
+
+def _parse_bs4_strainer(html):
+    """BeautifulSoup, но дерево строится только для нужных частей страницы"""
+    cards, _ = _cards_bs4(BeautifulSoup(html, "lxml", parse_only=CARDS_STRAINER))
+    _, next_href = _cards_bs4(BeautifulSoup(html, "lxml", parse_only=NEXT_STRAINER))
+    return cards, next_href
+
+
+XPATH_CARDS_LIST = f"//div[{has_class('cards__list')}]"
+XPATH_CARDS = f".//div[{has_class('card')}]"
+XPATH_TITLE = f".//*[{has_class('card__title')}]"
+XPATH_PRICE = f".//*[{has_class('card__price')}]"
+XPATH_NEXT = "(//a[@rel='next'][@href] | //link[@rel='next'][@href])[1]/@href"
+
+
+def _lxml_text(element):
+    """текст элемента как у get_text(strip=True): куски без пробелов по краям, склеенные"""
+    return "".join(text.strip() for text in element.xpath(".//text()"))
+
+
+def _first(elements):
+    return elements[0] if elements else None
+
+
+def _parse_lxml(html):
+    """lxml и XPath по списку карточек, без объектов BeautifulSoup"""
+    try:
+        tree = lxml.html.document_fromstring(html)
+    except lxml.etree.ParserError:
+        # пустое тело ответа (или одни пробелы и комментарии): карточек нет, как у остальных способов
+        return [], None
+    next_href = _first(tree.xpath(XPATH_NEXT))
+    cards = []
+    products_container = _first(tree.xpath(XPATH_CARDS_LIST))
+    if products_container is not None:
+        for card in products_container.xpath(XPATH_CARDS):
+            title_tag = _first(card.xpath(XPATH_TITLE))
+            price_tag = _first(card.xpath(XPATH_PRICE))
+            href = _first(card.xpath(".//a/@href"))
+            cards.append((
+                _lxml_text(title_tag) if title_tag is not None else None,
+                _lxml_text(price_tag) if price_tag is not None else None,
+                href,
+            ))
+    return cards, str(next_href) if next_href is not None else None
+
+
+def _parse_selectolax(html):
+    """selectolax (lexbor) и CSS-селекторы"""
+    tree = SelectolaxParser(html)
+    next_link = tree.css_first('a[rel="next"][href], link[rel="next"][href]')
+    cards = []
+    products_container = tree.css_first("div.cards__list")
+    if products_container is not None:
+        for card in products_container.css("div.card"):
+            title_tag = card.css_first(".card__title")
+            price_tag = card.css_first(".card__price")
+            link_tag = card.css_first("a[href]")
+            cards.append((
+                title_tag.text(strip=True) if title_tag is not None else None,
+                price_tag.text(strip=True) if price_tag is not None else None,
+                link_tag.attributes["href"] if link_tag is not None else None,
+            ))
+    return cards, next_link.attributes["href"] if next_link is not None else None
+
+
+PARSERS = {"bs4": _parse_bs4, "bs4-strainer": _parse_bs4_strainer, "lxml": _parse_lxml}
+if SelectolaxParser is not None:
+    PARSERS["selectolax"] = _parse_selectolax
+DEFAULT_PARSER = "lxml"
+
+
+def parse_products(html, cat_name, base_url, parser=DEFAULT_PARSER):
+    """
+    товары со страницы категории и ссылка на следующую страницу выдачи
+    parser - способ разбора из PARSERS, результат у всех одинаковый
+    возвращает ([(category, name, price, url, shop)], url следующей страницы или None)
+    """
+    cards, next_href = PARSERS[parser](html)
+    next_url = urljoin(base_url, next_href) if next_href is not None else None
+    products = [_card_product(cat_name, base_url, *card) for card in cards]
+    return products, next_url
+
+
+def _known_next_page(state, url):
+    """следующая страница выдачи, найденная на странице url в прошлый раз"""
+    next_pages = state.children_of(url)
+    return next_pages[0][2] if next_pages else None
+
+
+async def crawl_category(fetcher, cat_name, cat_url, base_url, state, validators, parser=DEFAULT_PARSER):
+    """
+    обходит все страницы выдачи категории; свежие по state страницы не загружает,
+    а переходит к следующей странице, найденной в прошлый раз
+    страницы запрашиваются условно по validators; не изменившиеся (304 или тот же хэш тела)
+    не разбираются, их товары уже есть в БД с прошлого обхода, а следующей берётся
+    ссылка, сохранённая с валидаторами при последнем разборе
+    возвращает (категория, товары, загруженные страницы PageRecord, число пропущенных)
+    """
+    products = []
+    pages = []
+    skipped = 0
+    seen = set()
+    url = cat_url
+    while url and url not in seen:
+        seen.add(url)
+        if state.status(url) is not None:
+            skipped += 1
+            url = _known_next_page(state, url)
+            continue
+
+        etag, last_modified, old_hash, old_next_url = validators.get(url, (None, None, None, None))
+        result = await fetcher.fetch_page(url, etag, last_modified)
+        if result is None:
+            pages.append(PageRecord(url, cat_name, "failed", None, etag, last_modified, old_hash))
+            break
+        if result.status == 304 or result.content_hash == old_hash:
+            next_url = old_next_url
+            pages.append(PageRecord(
+                url, cat_name, "unchanged", next_url,
+                result.etag or etag, result.last_modified or last_modified, result.content_hash or old_hash,
+            ))
+        else:
+            try:
+                page_products, next_url = parse_products(result.text, cat_name, base_url, parser)
+            except Exception as e:
+                # неразобранная страница не должна останавливать обход остальных категорий;
+                # прежние валидаторы остаются, так что следующий обход разберёт её снова
+                print(f"Не удалось разобрать {url}: {e!r}")
+                pages.append(PageRecord(url, cat_name, "failed", None, etag, last_modified, old_hash))
+                break
+            pages.append(PageRecord(
+                url, cat_name, "products" if page_products else "empty", next_url,
+                result.etag, result.last_modified, result.content_hash,
+            ))
+            products.extend(page_products)
+        url = next_url
+    return cat_name, products, pages, skipped
+
+
+async def crawl(base_url=BASE_URL, db_name=DB_NAME, concurrency=CONCURRENCY, rate=HOST_RATE,
+                retries=RETRIES, backoff=BACKOFF_BASE, resume=False, fresh_hours=FRESH_HOURS,
+                parser=DEFAULT_PARSER, force=False):
+    """
+    загружает каталог и параллельно все категории (не больше concurrency запросов
+    одновременно и rate запросов в секунду к хосту); товары пишутся в БД по мере
+    готовности категорий из одного места, так что запись не конкурирует сама с собой
+    resume=True пропускает страницы, загруженные не раньше fresh_hours часов назад
+    parser - способ разбора страниц категорий (см. PARSERS)
+    force=True не делает условных запросов и разбирает все загруженные страницы заново
+    (например, после изменения парсера)
+    """
+    conn = sqlite3.connect(db_name)
+    state = ResumeState(conn, fresh_hours if resume else None)
+    conn.close()
+    if resume:
+        print(f"Продолжаю обход: свежих страниц {len(state.fresh)}")
+    validators = {} if force else load_validators(db_name)
+
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    stats = {"categories": 0, "pages": 0, "skipped": 0, "unchanged": 0, "products": 0, "inserted": 0}
+
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout, connector=connector) as session:
+        fetcher = Fetcher(session, concurrency, rate, retries, backoff)
+        # получаем список всех категорий с главной страницы каталога
+        catalog_url = urljoin(base_url, "/catalog/")
+        if state.status(catalog_url) is not None:
+            category_links = [(cat_name, cat_url) for _, cat_name, cat_url in state.children_of(catalog_url)]
+            stats["skipped"] += 1
+        else:
+            catalog_html = await fetcher.fetch(catalog_url)
+            if catalog_html is None:
+                return stats
+            category_links = parse_category_links(catalog_html, base_url)
+            conn = sqlite3.connect(db_name)
+            forget_children(conn, catalog_url, [cat_url for _, cat_url in category_links])
+            record_discovered(conn, catalog_url, [(1, cat_name, cat_url) for cat_name, cat_url in category_links])
+            record_fetched(conn, catalog_url, "subcategories" if category_links else "empty", 0)
+            conn.commit()
+            conn.close()
+        print(f"Найдено категорий: {len(category_links)}")
+
+        tasks = [
+            crawl_category(fetcher, cat_name, cat_url, base_url, state, validators, parser)
+            for cat_name, cat_url in category_links
+        ]
+        for task in asyncio.as_completed(tasks):
+            cat_name, products, pages, skipped = await task
+            unchanged = sum(page.status == "unchanged" for page in pages)
+            print(f"\n--- Категория: {cat_name}: страниц {len(pages)}, не изменилось {unchanged}, "
+                  f"пропущено свежих {skipped}, товаров {len(products)} ---")
+            stats["categories"] += 1
+            stats["pages"] += len(pages)
+            stats["unchanged"] += unchanged
+            stats["skipped"] += skipped
+            stats["products"] += len(products)
+            stats["inserted"] += save_products(products, db_name, pages)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="парсер каталога Светофора")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--db", default=DB_NAME, help="файл SQLite для товаров")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="одновременных запросов")
+    parser.add_argument("--rate", type=float, default=HOST_RATE, help="запросов в секунду к хосту (0 - без ограничения)")
+    parser.add_argument("--resume", action="store_true", help="продолжить прошлый обход, не загружая свежие страницы")
+    parser.add_argument("--fresh-hours", type=float, default=FRESH_HOURS,
+                        help="сколько часов страница считается свежей для --resume")
+    parser.add_argument("--parser", choices=sorted(PARSERS), default=DEFAULT_PARSER,
+                        help="способ разбора страниц категорий")
+    parser.add_argument("--force", action="store_true",
+                        help="разобрать все страницы заново, даже не изменившиеся (после изменения парсера)")
+    args = parser.parse_args()
+
+    initialize_db(args.db)
+    started = time.perf_counter()
+    stats = asyncio.run(crawl(args.base_url, args.db, args.concurrency, args.rate,
+                              resume=args.resume, fresh_hours=args.fresh_hours, parser=args.parser,
+                              force=args.force))
+    print(f"\nКатегорий: {stats['categories']}, страниц: {stats['pages']}, "
+          f"не изменилось и не разбиралось: {stats['unchanged']}, пропущено свежих: {stats['skipped']}, "
+          f"товаров: {stats['products']}, новых: {stats['inserted']} "
+          f"за {time.perf_counter() - started:.1f} с")
+
 
+if __name__ == "__main__":
+    main()
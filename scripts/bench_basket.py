@@ -0,0 +1,88 @@
+"""
+замер расчёта корзины на синтетическом каталоге
+
+заполняет временную БД двумя магазинами с общими и похожими товарами, строит
+индекс совпадений и считает корзины разного размера; печатает время и число запросов
+запуск из корня проекта: python -m scripts.bench_basket --products 20000 --sizes 10 100 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from backend.app import create_app
+from backend.basket import BasketItem, optimize_basket
+from backend.extensions import db
+from backend.matching import name_keys, rebuild_match_index
+from backend.models import Store
+from parsers.merge_to_main_db import bulk_insert_products, set_bulk_pragmas
+from scripts.synthetic_catalog import add_categories, synthetic_name
+
+
+def _fill(products: int, categories: int):
+    """товары обоих магазинов: половина есть в обоих, у остальных название своё"""
+    rng = random.Random(1)
+    stores = [Store(name="Окей"), Store(name="Светофор")]
+    category_objs = add_categories(categories)
+    db.session.add_all(stores)
+    db.session.commit()
+
+    names = []
+    rows = []
+    for i in range(products):
+        name = synthetic_name(rng, i)
+        names.append(name)
+        for store in stores if i % 2 == 0 else [rng.choice(stores)]:
+            normalized_name, name_tokens = name_keys(name)
+            rows.append({
+                "name": name, "normalized_name": normalized_name, "name_tokens": name_tokens,
+                "price": round(rng.uniform(30, 500), 2), "url": f"https://example.ru/{store.id}/{i}",
+                "store_id": store.id, "category_id": category_objs[i % categories].id,
+            })
+    bulk_insert_products(db.session.connection(), rows)
+    db.session.commit()
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "basket.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "CACHE_TYPE": "null"})
+        with app.app_context():
+            set_bulk_pragmas()
+            db.create_all()
+            started = time.perf_counter()
+            names = _fill(args.products, args.categories)
+            rebuild_match_index()
+            print(f"Товаров: {args.products}, каталог и индекс совпадений за {time.perf_counter() - started:.1f} с")
+
+            executed = []
+            event.listen(db.engine, "before_cursor_execute", lambda *a: executed.append(a[2]))
+            rng = random.Random(2)
+            for size in args.sizes:
+                items = [BasketItem(name, rng.randint(1, 3)) for name in rng.sample(names, size)]
+                best = float("inf")
+                for _ in range(args.repeat):
+                    executed.clear()
+                    started = time.perf_counter()
+                    result = optimize_basket(items)
+                    best = min(best, time.perf_counter() - started)
+                single = result["best_store"]
+                single_text = f"{single['total']:.2f} ₽ ({single['store']})" if single else "нет"
+                print(f"корзина из {size}: {best * 1000:.1f} мс, запросов {len(executed)}, "
+                      f"разбиение {result['split']['total']:.2f} ₽, один магазин {single_text}")
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
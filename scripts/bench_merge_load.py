@@ -0,0 +1,113 @@
+"""
+сравнение загрузки товаров в основную БД: ORM по одному объекту против
+пакетной вставки Core (executemany, WAL, synchronous=OFF, индексы после загрузки)
+
+каталог синтетический, БД создаются во временном каталоге
+запуск из корня проекта: python -m scripts.bench_merge_load --rows 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.matching import name_keys
+from backend.models import Product, Store
+from parsers.merge_to_main_db import bulk_insert_products, set_bulk_pragmas
+from scripts.synthetic_catalog import add_categories, synthetic_name
+
+
+def _synthetic_rows(count: int, categories: int):
+    rng = random.Random(1)
+    for i in range(count):
+        yield synthetic_name(rng, i), round(rng.uniform(30, 500), 2), f"https://example.ru/p/{i}", i % categories
+
+
+def _prepare(path: str, categories: int, bulk: bool):
+    """пустая БД с магазином и категориями; возвращает (app, id магазина, id категорий)"""
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "CACHE_TYPE": "null"})
+    with app.app_context():
+        if bulk:
+            set_bulk_pragmas()
+        db.create_all()
+        store = Store(name="Окей")
+        category_objs = add_categories(categories)
+        db.session.add(store)
+        db.session.commit()
+        return app, store.id, [c.id for c in category_objs]
+
+
+def load_orm(path: str, rows: int, categories: int) -> float:
+    """прежний способ: объект Product на каждую строку и один commit в конце"""
+    app, store_id, category_ids = _prepare(path, categories, bulk=False)
+    with app.app_context():
+        started = time.perf_counter()
+        for name, price, url, category in _synthetic_rows(rows, categories):
+            normalized_name, name_tokens = name_keys(name)
+            db.session.add(Product(
+                name=name,
+                normalized_name=normalized_name,
+                name_tokens=name_tokens,
+                price=price,
+                url=url,
+                store_id=store_id,
+                category_id=category_ids[category],
+            ))
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        db.engine.dispose()
+    return elapsed
+
+
+def load_bulk(path: str, rows: int, categories: int) -> float:
+    """пакетная вставка Core одной транзакцией, индексы строятся после загрузки"""
+    app, store_id, category_ids = _prepare(path, categories, bulk=True)
+    with app.app_context():
+        started = time.perf_counter()
+        connection = db.session.connection()
+        indexes = list(Product.__table__.indexes)
+        for index in indexes:
+            index.drop(connection)
+
+        def _params():
+            for name, price, url, category in _synthetic_rows(rows, categories):
+                normalized_name, name_tokens = name_keys(name)
+                yield {
+                    "name": name,
+                    "normalized_name": normalized_name,
+                    "name_tokens": name_tokens,
+                    "price": price,
+                    "url": url,
+                    "store_id": store_id,
+                    "category_id": category_ids[category],
+                }
+
+        bulk_insert_products(connection, _params())
+        for index in indexes:
+            index.create(connection)
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        db.engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--categories", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, loader in (("ORM", load_orm), ("Core bulk", load_bulk)):
+            elapsed = loader(os.path.join(tmp, f"{label}.db"), args.rows, args.categories)
+            results[label] = elapsed
+            print(f"{label}: {args.rows} строк за {elapsed:.2f} с ({args.rows / elapsed:,.0f} строк/с)")
+
+    print(f"Ускорение: x{results['ORM'] / results['Core bulk']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+замер запросов к истории цен на синтетическом каталоге
+
+заполняет временную БД товарами и историей их цен (только изменения), затем
+замеряет последнюю цену и минимум/максимум за период для пачки товаров
+(запросы /api/price-history),
+дописывание изменений после объединения БД и печатает планы запросов
+запуск из корня проекта: python -m scripts.bench_price_history --products 100000 --changes 10
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.models import Category, PriceHistory, Product, Store
+from backend.price_history import latest_prices, price_range, record_price_changes
+from parsers.merge_to_main_db import bulk_insert_products, set_bulk_pragmas
+
+DAY = 24 * 3600
+# история начинается столько дней назад
+HISTORY_DAYS = 365
+
+
+def _fill(products: int, changes: int, now: int) -> int:
+    """товары и история: в среднем changes изменений цены на товар за HISTORY_DAYS дней"""
+    rng = random.Random(1)
+    store = Store(name="Окей")
+    category = Category(name="Категория", normalized_name="категория")
+    db.session.add_all([store, category])
+    db.session.commit()
+
+    connection = db.session.connection()
+    history = []
+    product_rows = []
+    for product_id in range(1, products + 1):
+        price = round(rng.uniform(30, 900), 2)
+        times = sorted(rng.sample(range(now - HISTORY_DAYS * DAY, now - DAY), rng.randint(1, 2 * changes - 1)))
+        for observed_at in times:
+            price = round(price * rng.uniform(0.8, 1.2), 2)
+            history.append((product_id, observed_at, store.id, price))
+        product_rows.append({
+            "id": product_id, "name": f"Товар {product_id}", "price": price,
+            "url": f"https://example.ru/p/{product_id}", "store_id": store.id, "category_id": category.id,
+        })
+    bulk_insert_products(connection, product_rows)
+    history.sort()
+    connection.execute(PriceHistory.__table__.insert(), [
+        {"product_id": p, "observed_at": t, "store_id": s, "price": v} for p, t, s, v in history
+    ])
+    db.session.commit()
+    return len(history)
+
+
+def _timed(label: str, func, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label}: {best * 1000:.1f} мс")
+    return result
+
+
+def _plan(sql: str, params: dict):
+    for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params):
+        print(f"    {row[-1]}")
+
+
+def _has_dbstat() -> bool:
+    """собран ли SQLite с виртуальной таблицей dbstat (размер таблиц по страницам)"""
+    try:
+        db.session.execute(text("SELECT 1 FROM dbstat LIMIT 1"))
+        return True
+    except OperationalError:
+        db.session.rollback()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--changes", type=int, default=10, help="изменений цены на товар в среднем")
+    parser.add_argument("--batch", type=int, default=500, help="товаров в одном запросе")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "CACHE_TYPE": "null"})
+        with app.app_context():
+            set_bulk_pragmas()
+            db.create_all()
+            started = time.perf_counter()
+            rows = _fill(args.products, args.changes, now)
+            print(f"Товаров: {args.products}, записей истории: {rows}, "
+                  f"заполнено за {time.perf_counter() - started:.1f} с")
+            pages = db.session.execute(text(
+                "SELECT count(*) FROM dbstat WHERE name = 'price_history'"
+            )).scalar() if _has_dbstat() else None
+            if pages:
+                page_size = db.session.execute(text("PRAGMA page_size")).scalar()
+                print(f"Размер price_history: {pages * page_size / 1024 / 1024:.1f} МБ, "
+                      f"{pages * page_size / rows:.1f} байт на запись")
+
+            ids = random.Random(2).sample(range(1, args.products + 1), min(args.batch, args.products))
+            latest = _timed(f"последняя цена для {len(ids)} товаров", lambda: latest_prices(ids), args.repeat)
+            _timed(f"мин./макс. за 30 дней для {len(ids)} товаров",
+                   lambda: price_range(ids, now - 30 * DAY), args.repeat)
+            _timed(f"мин./макс. за год для {len(ids)} товаров",
+                   lambda: price_range(ids, now - HISTORY_DAYS * DAY), args.repeat)
+
+            cached = dict(db.session.query(Product.id, Product.price).filter(Product.id.in_(ids)))
+            ok = all(latest[product_id][0] == cached[product_id] for product_id in ids)
+            print(f"Product.price совпадает с последней записью истории: {'да' if ok else 'НЕТ'}")
+
+            # объединение БД поменяло цены 1% товаров
+            changed = max(1, args.products // 100)
+            db.session.execute(
+                text("UPDATE product SET price = price + 1 WHERE id % 100 = 0")
+            )
+            db.session.commit()
+            started = time.perf_counter()
+            recorded = record_price_changes(now)
+            print(f"дописано изменений: {recorded} из {changed} за {(time.perf_counter() - started) * 1000:.0f} мс")
+
+            print("План: последняя цена")
+            _plan("SELECT price FROM price_history WHERE product_id = :id "
+                  "ORDER BY observed_at DESC LIMIT 1", {"id": ids[0]})
+            print("План: цены за период")
+            _plan("SELECT min(price), max(price) FROM price_history "
+                  "WHERE product_id = :id AND observed_at >= :since", {"id": ids[0], "since": now - 30 * DAY})
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+замер скорости способов разбора страниц Светофора на сохранённых html-фикстурах
+
+каждый способ из pars_svetofor.PARSERS разбирает все страницы scripts/fixtures/svetofor
+--repeat раз; печатается время на страницу и ускорение относительно полного дерева BeautifulSoup
+запуск из корня проекта: python -m scripts.bench_svetofor_parsers --repeat 50
+"""
+import argparse
+import time
+from pathlib import Path
+
+from parsers import pars_svetofor
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "svetofor"
+BASELINE_PARSER = "bs4"
+
+
+def _bench(name: str, pages, repeat: int) -> float:
+    """лучшее из repeat время разбора всех страниц, с"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html in pages:
+            pars_svetofor.parse_products(html, "Категория", pars_svetofor.BASE_URL, name)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="каталог с html-страницами")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = [page.read_text(encoding="utf-8") for page in sorted(Path(args.fixtures).glob("*.html"))]
+    size = sum(len(html.encode()) for html in pages)
+    print(f"Страниц: {len(pages)}, {size / 1024:.0f} КБ, повторов: {args.repeat}")
+
+    timings = {name: _bench(name, pages, args.repeat) for name in sorted(pars_svetofor.PARSERS)}
+    baseline = timings[BASELINE_PARSER]
+    for name, elapsed in sorted(timings.items(), key=lambda item: item[1]):
+        default = " (по умолчанию)" if name == pars_svetofor.DEFAULT_PARSER else ""
+        print(f"{name:>14}: {elapsed / len(pages) * 1000:7.2f} мс/страница, x{baseline / elapsed:.1f}{default}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+проверка разбора текста корзины: количество в конце строки ("молоко x2")
+отделяется от названия, а размеры в названии ("Пакеты 30x40") количеством не считаются
+запуск из корня проекта: python -m scripts.check_basket
+"""
+import sys
+
+from backend.basket import MAX_QUANTITY, BasketItem, parse_basket
+
+CASES = (
+    ("молоко x2", [BasketItem("молоко", 2)]),
+    ("Молоко 1 л х 3", [BasketItem("Молоко 1 л", 3)]),
+    ("кефир × 4\n\n  сыр * 2  ", [BasketItem("кефир", 4), BasketItem("сыр", 2)]),
+    ("хлеб", [BasketItem("хлеб", 1)]),
+    ("хлеб x0", [BasketItem("хлеб", 1)]),
+    ("хлеб x5000", [BasketItem("хлеб", MAX_QUANTITY)]),
+    ("x2", [BasketItem("x2", 1)]),
+    ("Пакеты 30x40", [BasketItem("Пакеты 30x40", 1)]),
+    ("Салфетки 3х100", [BasketItem("Салфетки 3х100", 1)]),
+    ("Салфетки 3х100 x2", [BasketItem("Салфетки 3х100", 2)]),
+)
+
+
+def main():
+    ok = True
+    for text, expected in CASES:
+        items = parse_basket(text)
+        passed = items == expected
+        ok = ok and passed
+        print(f"{'OK' if passed else 'ОШИБКА'} {text!r}: {[tuple(item) for item in items]}"
+              + ("" if passed else f", ожидалось {[tuple(item) for item in expected]}"))
+    print("OK" if ok else "ОШИБКА: корзина разобрана неверно")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
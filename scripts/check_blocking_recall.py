@@ -0,0 +1,96 @@
+"""
+проверка блокировки кандидатов в сопоставлении товаров
+
+для каждой категории основной БД сравнивает пары, найденные полным перебором,
+с парами, которые пропускает блокировка, и печатает полноту (recall) и долю
+пар, которые блокировка отправляет на сравнение (чем меньше, тем быстрее)
+--synthetic N вместо БД проверяет одну категорию из N сгенерированных названий
+запуск из корня проекта: python -m scripts.check_blocking_recall
+"""
+import argparse
+import random
+import sys
+import time
+
+from backend.app import app
+from backend.matching import (
+    BLOCKING_MIN_TRIGRAMS, BLOCKING_MIN_WORDS, check_blocking_recall, normalize_product_name, product_key,
+)
+from backend.models import Category, Product
+
+KINDS = ("Молоко", "Кефир", "Сыр", "Творог", "Йогурт", "Сметана", "Масло", "Ряженка",
+         "Снежок", "Сырок", "Биойогурт", "Десерт", "Пудинг", "Коктейль", "Сливки", "Простокваша")
+ADJECTIVES = ("пастеризованное", "ультрапастеризованный", "топлёное", "классический", "фруктовый",
+              "клубничный", "ванильный", "шоколадный", "натуральный", "отборное", "детский")
+BRANDS = ("Простоквашино", "Домик в деревне", "Савушкин", "Агуша", "Красная цена", "Весёлый молочник",
+          "Экомилк", "Danone", "Parmalat", "Вкусвилл", "Эконива", "Брест-Литовск", "Президент")
+SIZES = ("1 л", "900 мл", "0,5 кг", "200 г", "450 г", "1 кг", "3,2%", "2,5%", "1,5%", "6%", "15%")
+
+
+def _synthetic_names(count: int):
+    """count разных названий: вид товара, иногда прилагательное, бренд и 1-2 размера"""
+    rng = random.Random(1)
+    names = set()
+    while len(names) < count:
+        parts = [rng.choice(KINDS)]
+        if rng.random() < 0.6:
+            parts.append(rng.choice(ADJECTIVES))
+        parts.append(rng.choice(BRANDS))
+        parts += rng.sample(SIZES, rng.randint(1, 2))
+        names.add(normalize_product_name(" ".join(parts)))
+    return sorted(names)
+
+
+def _categories(synthetic: int):
+    """[(название категории, нормализованные названия товаров)]"""
+    if synthetic:
+        return [(f"синтетическая ({synthetic})", _synthetic_names(synthetic))]
+    with app.app_context():
+        return [
+            (category.name, sorted(product_key(p) for p in Product.query.filter_by(category_id=category.id)))
+            for category in Category.query.order_by(Category.id).all()
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--min-words", type=int, default=BLOCKING_MIN_WORDS)
+    parser.add_argument("--min-trigrams", type=int, default=BLOCKING_MIN_TRIGRAMS)
+    parser.add_argument("--min-recall", type=float, default=0.98, help="ниже этой полноты проверка не проходит")
+    parser.add_argument("--synthetic", type=int, default=0, help="сгенерировать категорию из N названий")
+    parser.add_argument("--show-missed", type=int, default=10, help="сколько потерянных пар показать")
+    args = parser.parse_args()
+
+    total_pairs = 0
+    total_found = 0
+    total_candidates = 0
+    total_all = 0
+
+    for category_name, names in _categories(args.synthetic):
+        started = time.perf_counter()
+        pairs, found, missed, candidates = check_blocking_recall(
+            names, min_words=args.min_words, min_trigrams=args.min_trigrams
+        )
+        elapsed = time.perf_counter() - started
+
+        all_pairs = len(names) * (len(names) - 1) // 2
+        total_pairs += pairs
+        total_found += found
+        total_candidates += candidates
+        total_all += all_pairs
+        recall = found / pairs if pairs else 1.0
+        ratio = candidates / all_pairs if all_pairs else 0.0
+        print(f"{category_name}: товаров {len(names)}, похожих пар {pairs}, recall {recall:.4f}, "
+              f"кандидатов {candidates}/{all_pairs} ({ratio:.3f}) ({elapsed:.2f} с)")
+        for name1, name2 in missed[:args.show_missed]:
+            print(f"    потеряна пара: {name1!r} ~ {name2!r}")
+
+    recall = total_found / total_pairs if total_pairs else 1.0
+    ratio = total_candidates / total_all if total_all else 0.0
+    print(f"Итого: похожих пар {total_pairs}, найдено {total_found}, recall {recall:.4f}, "
+          f"кандидатов {total_candidates}/{total_all} ({ratio:.3f})")
+    return 0 if recall >= args.min_recall else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+проверка парсера Окея на статических html-фикстурах (scripts/fixtures/okey)
+
+обходит фикстуры пулом headless-браузеров без вежливых пауз каждым способом
+извлечения товаров и сверяет записанные товары с ожидаемыми; нужен установленный Chrome
+запуск из корня проекта: python -m scripts.check_okey_crawl --workers 2
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from parsers import pars
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "okey"
+
+# (категория, название, цена) всех товаров фикстур, которые должен собрать парсер
+EXPECTED = {
+    ("Молочные продукты, яйца", "Молоко Простоквашино 2,5% 930 мл", 89.9),
+    ("Молочные продукты, яйца", "Кефир Домик в деревне 1% 900 г", 79.99),
+    ("Молочные продукты, яйца", "Сыр Российский 200 г", 1249.0),
+    ("Молочные продукты, яйца", "Яйцо С1 10 шт", 119.9),
+    ("Бакалея / Крупы", "Гречка ядрица 900 г", 99.9),
+    ("Бакалея / Крупы", "Рис круглозерный 900 г", 89.9),
+    ("Бакалея / Макароны / Спагетти", "Спагетти Barilla 450 г", 139.9),
+    ("Бакалея / Макароны / Спагетти", "Спагетти Макфа 450 г", 79.9),
+    ("Бакалея / Макароны / Рожки", "Рожки Макфа 450 г", 69.9),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--extract", choices=sorted(pars.EXTRACTORS), action="append",
+                        help="способ извлечения (по умолчанию - все)")
+    args = parser.parse_args()
+
+    start_url = (FIXTURES_DIR / "catalog.html").as_uri()
+    ok = True
+    for mode in args.extract or sorted(pars.EXTRACTORS):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "okey.db")
+            pars.initialize_db(db_path)
+            started = time.perf_counter()
+            inserted = pars.crawl(start_url, db_path, workers=args.workers, headless=True, delay_scale=0,
+                                  extract=mode)
+            elapsed = time.perf_counter() - started
+
+            conn = sqlite3.connect(db_path)
+            rows = {tuple(row) for row in conn.execute("SELECT category, name, price FROM okey_products")}
+            conn.close()
+
+        print(f"{mode}: воркеров {args.workers}, новых товаров {inserted} за {elapsed:.1f} с")
+        for row in sorted(EXPECTED - rows):
+            print(f"    не найден: {row}")
+        for row in sorted(rows - EXPECTED):
+            print(f"    лишний: {row}")
+        ok = ok and rows == EXPECTED
+
+    print("OK" if ok else "ОШИБКА: товары не совпадают с фикстурами")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
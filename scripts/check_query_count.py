@@ -0,0 +1,92 @@
+"""
+проверка числа SQL-запросов на страницу
+
+заполняет временную БД каталогом разного размера и убеждается, что
+каждая страница выполняет одно и то же число запросов (нет N+1) и ничего не пишет в БД
+запуск из корня проекта: python -m scripts.check_query_count
+"""
+import sys
+
+from sqlalchemy import event
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.matching import name_keys, rebuild_match_index
+from backend.models import Category, Product, Store
+from backend.price_history import record_price_changes
+from backend.search_index import rebuild_product_fts
+
+CATALOG_SIZES = (5, 50)
+PAGES = (
+    "/", "/categories", "/category/1", "/category/2", "/search?query=молоко",
+    "/api/prices?name=Молоко%200%201%20л&name=Кефир%202&name=Сыр%20российский%203&name=хлеб",
+    "/basket?items=Молоко%200%201%20л%0AКефир%202%20x2%0AСыр%20российский%203",
+    "/api/price-history?id=1&id=2&id=3&days=30",
+)
+NAMES = ("Молоко {} 1 л", "Молоко пастеризованное {} 900 мл", "Кефир {}", "Сыр российский {}")
+
+
+def _fill_catalog(products_per_store: int):
+    """
+    заполняет пустую БД: два магазина, категория с товарами в обоих и пустая категория;
+    текущие цены товаров записываются в историю цен
+    """
+    db.create_all()
+    category = Category(name="Молочные продукты")
+    stores = [Store(name="Окей"), Store(name="Светофор")]
+    db.session.add_all([category, Category(name="Хлеб"), *stores])
+    for store in stores:
+        for i in range(products_per_store):
+            name = NAMES[i % len(NAMES)].format(i)
+            normalized_name, name_tokens = name_keys(name)
+            db.session.add(Product(
+                name=name,
+                normalized_name=normalized_name,
+                name_tokens=name_tokens,
+                price=50.0 + i,
+                store=store,
+                category=category,
+            ))
+    db.session.commit()
+    record_price_changes()
+    rebuild_match_index()
+    rebuild_product_fts()
+
+
+def _count_queries(size: int):
+    """возвращает {страница: (число запросов, число записей в БД)} для каталога заданного размера"""
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "CACHE_TYPE": "null"})
+    with app.app_context():
+        _fill_catalog(size)
+        engine = db.engine
+
+    # каждая страница запрашивается в своём контексте, с пустой сессией
+    executed = []
+    event.listen(engine, "before_cursor_execute", lambda *args: executed.append(args[2]))
+
+    counts = {}
+    client = app.test_client()
+    for page in PAGES:
+        executed.clear()
+        response = client.get(page)
+        if response.status_code != 200:
+            raise RuntimeError(f"{page}: статус {response.status_code}")
+        writes = [s for s in executed if not s.lstrip().upper().startswith(("SELECT", "WITH"))]
+        counts[page] = (len(executed), len(writes))
+    return counts
+
+
+def main():
+    results = {size: _count_queries(size) for size in CATALOG_SIZES}
+    failed = False
+    for page in PAGES:
+        per_size = [results[size][page][0] for size in CATALOG_SIZES]
+        writes = sum(results[size][page][1] for size in CATALOG_SIZES)
+        status = "N+1" if len(set(per_size)) != 1 else "W  " if writes else "OK "
+        failed = failed or status != "OK "
+        print(f"{status} {page}: запросов {per_size} при товарах {list(CATALOG_SIZES)}, записей {writes}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
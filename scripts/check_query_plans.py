@@ -0,0 +1,101 @@
+"""
+проверка планов SQL-запросов страниц (EXPLAIN QUERY PLAN)
+
+заполняет временную БД каталогом, открывает каждую страницу из check_query_count,
+записывает выполненные SELECT и для каждого смотрит план: полный проход по таблице
+(SCAN без индекса) считается ошибкой, кроме крошечных служебных таблиц;
+сортировки без индекса (USE TEMP B-TREE) только подсчитываются - сортировку
+по рангу поиска индекс не заменит
+запуск из корня проекта: python -m scripts.check_query_plans
+"""
+import argparse
+import re
+import sys
+
+from sqlalchemy import event
+
+from backend.app import create_app
+from backend.extensions import db
+from scripts.check_query_count import PAGES, _fill_catalog
+
+# таблицы из нескольких строк: проход по ним дешевле индекса
+SMALL_TABLES = {"store", "dataset_version"}
+# SCAN <таблица> [AS псевдоним] без индекса; "SCAN ... USING (COVERING) INDEX" - проход по индексу
+FULL_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def _capture(app, pages):
+    """{страница: [(SQL, параметры)]} выполненных SELECT"""
+    executed = []
+
+    def _remember(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            executed.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _remember)
+    captured = {}
+    client = app.test_client()
+    for page in pages:
+        executed.clear()
+        response = client.get(page)
+        if response.status_code != 200:
+            raise RuntimeError(f"{page}: статус {response.status_code}")
+        captured[page] = list(executed)
+    event.remove(engine, "before_cursor_execute", _remember)
+    return captured
+
+
+def _plan(connection, statement, parameters):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=50, help="товаров в каждом магазине")
+    parser.add_argument("--verbose", action="store_true", help="печатать планы всех запросов")
+    args = parser.parse_args()
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "CACHE_TYPE": "null"})
+    with app.app_context():
+        _fill_catalog(args.products)
+    captured = _capture(app, PAGES)
+
+    # в плане бывают и подзапросы (SCAN anon_1) - проверяются только таблицы моделей
+    tables = set(db.metadata.tables)
+    failed = False
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            for page, statements in captured.items():
+                scans = []
+                sorts = 0
+                for statement, parameters in statements:
+                    plan = _plan(connection, statement, parameters)
+                    for detail in plan:
+                        match = FULL_SCAN_RE.match(detail)
+                        if match and match.group(1) in tables and match.group(1) not in SMALL_TABLES:
+                            scans.append((detail, " ".join(statement.split())))
+                        sorts += detail.startswith("USE TEMP B-TREE")
+                    if args.verbose:
+                        print(f"    {' '.join(statement.split())[:120]}")
+                        for detail in plan:
+                            print(f"        {detail}")
+                failed = failed or bool(scans)
+                print(f"{'SCAN' if scans else 'OK  '} {page}: запросов {len(statements)}, "
+                      f"сортировок без индекса {sorts}")
+                for detail, statement in scans:
+                    print(f"    {detail}: {statement[:160]}")
+        finally:
+            connection.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+проверка обновления схемы БД, собранной до нормализованных названий и ссылок товаров
+
+создаёт БД со схемой первой версии (таблицы store, category, product без новых
+колонок) и несколькими товарами, обновляет её upgrade_schema, как scripts.migrate_db,
+и проверяет: колонки и индексы совпадают с БД, созданной по моделям, нормализованные
+названия заполнены, повторный запуск ничего не меняет, а все страницы из
+check_query_count открываются - до пересборки индексов (как сразу после миграции)
+и после неё (как merge_to_main_db --rebuild-index); затем объединяет с обновлённой
+БД парсерные БД с --incremental: без ссылок товаров БД собирается заново (нет
+устаревших товаров, дублей категорий и товаров без ссылки), а следующий
+инкрементальный запуск ничего не меняет
+запуск из корня проекта: python -m scripts.check_schema_upgrade
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from sqlalchemy import inspect
+
+from backend.app import create_app
+from backend.extensions import db
+from backend.matching import name_keys, rebuild_match_index
+from backend.schema import upgrade_schema
+from backend.search_index import rebuild_product_fts
+from parsers import merge_to_main_db
+from scripts.check_query_count import NAMES, PAGES
+
+# схема первой версии (как в instance/shop.db)
+BASELINE_SCHEMA = """
+CREATE TABLE store (
+    id INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE TABLE category (
+    id INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    image VARCHAR(100),
+    PRIMARY KEY (id)
+);
+CREATE TABLE product (
+    id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    price FLOAT,
+    store_id INTEGER,
+    category_id INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(store_id) REFERENCES store (id),
+    FOREIGN KEY(category_id) REFERENCES category (id)
+);
+"""
+PRODUCTS_PER_STORE = 20
+# товаров каждого магазина, которые парсеры нашли снова (остальные устарели)
+PARSED_PER_STORE = 12
+
+
+def _baseline_db(path: str):
+    """БД первой версии: два магазина, категория с товарами и пустая категория"""
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany("INSERT INTO store (id, name) VALUES (?, ?)", [(1, "Окей"), (2, "Светофор")])
+    conn.executemany("INSERT INTO category (id, name) VALUES (?, ?)", [(1, "Молочные продукты"), (2, "Хлеб")])
+    conn.executemany(
+        "INSERT INTO product (name, price, store_id, category_id) VALUES (?, ?, ?, 1)",
+        [
+            (NAMES[i % len(NAMES)].format(i), 50.0 + i, store_id)
+            for store_id in (1, 2) for i in range(PRODUCTS_PER_STORE)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _parser_dbs(tmp: str):
+    """парсерные БД Окея и Светофора с частью товаров БД первой версии; возвращает их пути"""
+    paths = {}
+    for code, table in (("okey", "okey_products"), ("svetofor", "svetofor_products")):
+        paths[code] = os.path.join(tmp, f"{table}.db")
+        conn = sqlite3.connect(paths[code])
+        conn.execute(f"CREATE TABLE {table} (category TEXT, name TEXT, price REAL, url TEXT PRIMARY KEY, shop TEXT)")
+        conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?)", [
+            ("Молочные продукты", NAMES[i % len(NAMES)].format(i), 50.0 + i,
+             f"https://{code}.example.ru/p/{i}", code)
+            for i in range(PARSED_PER_STORE)
+        ])
+        conn.commit()
+        conn.close()
+    return paths
+
+
+def _incremental_merge(tmp: str, path: str):
+    """
+    merge_to_main_db --incremental поверх обновлённой БД path (в её копии)
+    возвращает (результаты двух запусков подряд, ошибки в собранной БД)
+    """
+    main_path = os.path.join(tmp, "merged.db")
+    shutil.copyfile(path, main_path)
+    paths = _parser_dbs(tmp)
+    saved = (merge_to_main_db.MAIN_DB_PATH, merge_to_main_db.OKEY_DB_PATH, merge_to_main_db.SVETOFOR_DB_PATH)
+    merge_to_main_db.MAIN_DB_PATH = main_path
+    merge_to_main_db.OKEY_DB_PATH = paths["okey"]
+    merge_to_main_db.SVETOFOR_DB_PATH = paths["svetofor"]
+    try:
+        results = [merge_to_main_db.merge_databases(incremental=True) for _ in range(2)]
+    finally:
+        merge_to_main_db.MAIN_DB_PATH, merge_to_main_db.OKEY_DB_PATH, merge_to_main_db.SVETOFOR_DB_PATH = saved
+
+    conn = sqlite3.connect(main_path)
+    try:
+        errors = []
+        products = conn.execute("SELECT count(*) FROM product").fetchone()[0]
+        if products != 2 * PARSED_PER_STORE:
+            errors.append(f"товаров {products}, а парсеры нашли {2 * PARSED_PER_STORE}")
+        without_url = conn.execute("SELECT count(*) FROM product WHERE url IS NULL").fetchone()[0]
+        if without_url:
+            errors.append(f"товаров без ссылки: {without_url}")
+        categories = conn.execute("SELECT name, normalized_name FROM category ORDER BY id").fetchall()
+        if len(categories) != 1 or categories[0][1] is None:
+            errors.append(f"категории: {categories}")
+    finally:
+        conn.close()
+    return results, errors
+
+
+def _schema(engine):
+    """{таблица: (колонки, индексы)} для сравнения с БД по моделям"""
+    inspector = inspect(engine)
+    return {
+        table: (
+            sorted(column["name"] for column in inspector.get_columns(table)),
+            sorted(index["name"] for index in inspector.get_indexes(table) if index["name"].startswith("ix_")),
+        )
+        for table in db.metadata.tables
+    }
+
+
+def _open_pages(app):
+    """[(страница, статус)] страниц, которые не открылись"""
+    client = app.test_client()
+    failed = []
+    for page in PAGES:
+        response = client.get(page)
+        if response.status_code != 200:
+            failed.append((page, response.status_code))
+    return failed
+
+
+def main():
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, 'fresh.db')}",
+                            "CACHE_TYPE": "null"})
+        with fresh.app_context():
+            db.create_all()
+            expected = _schema(db.engine)
+            db.engine.dispose()
+
+        path = os.path.join(tmp, "baseline.db")
+        _baseline_db(path)
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "CACHE_TYPE": "null"})
+        with app.app_context():
+            changes = upgrade_schema()
+            print(f"Добавлены колонки: {', '.join(changes['columns'])}")
+            print(f"Дополнено товаров: {changes['backfilled']}, создано индексов: {len(changes['indexes'])}")
+
+            differs = {table for table, schema in _schema(db.engine).items() if schema != expected[table]}
+            print(f"{'ОШИБКА' if differs else 'OK'} схема совпадает с БД по моделям"
+                  + (f": расходятся {', '.join(sorted(differs))}" if differs else ""))
+            ok = ok and not differs
+
+            conn = db.engine.raw_connection()
+            try:
+                rows = conn.execute("SELECT name, normalized_name, name_tokens FROM product").fetchall()
+            finally:
+                conn.close()
+            wrong = [name for name, normalized, tokens in rows if (normalized, tokens) != name_keys(name)]
+            print(f"{'ОШИБКА' if wrong else 'OK'} нормализованные названия: {len(rows) - len(wrong)} из {len(rows)}")
+            ok = ok and not wrong
+
+            repeated = upgrade_schema()
+            print(f"{'ОШИБКА' if any(repeated.values()) else 'OK'} повторный запуск: {repeated}")
+            ok = ok and not any(repeated.values())
+
+        failed = _open_pages(app)
+        with app.app_context():
+            rebuild_match_index()
+            rebuild_product_fts()
+        failed_rebuilt = _open_pages(app)
+        for label, pages in (("после миграции", failed), ("после пересборки индексов", failed_rebuilt)):
+            print(f"{'ОШИБКА' if pages else 'OK'} страницы {label}"
+                  + "".join(f"\n    {page}: статус {status}" for page, status in pages))
+            ok = ok and not pages
+        with app.app_context():
+            db.engine.dispose()
+
+        (first, repeated), errors = _incremental_merge(tmp, path)
+        print(f"{'ОШИБКА' if errors else 'OK'} инкрементальное объединение после миграции: {first}"
+              + "".join(f"\n    {error}" for error in errors))
+        ok = ok and not errors
+        changed = any(repeated.values())
+        print(f"{'ОШИБКА' if changed else 'OK'} повторное инкрементальное объединение: {repeated}")
+        ok = ok and not changed
+
+    print("OK" if ok else "ОШИБКА: схема старой БД не обновлена")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+проверка асинхронного парсера Светофора на локальном сервере с фикстурами
+
+обходит синтетический каталог последовательно (concurrency=1) и параллельно,
+сверяет число товаров в БД с каталогом и сравнивает время обхода;
+затем имитирует сбой (последние страницы одной категории не сохранены)
+и проверяет, что --resume догружает только их; повторные обходы проверяют, что
+неизменившиеся страницы не разбираются: по 304 на условный запрос, по хэшу тела
+без валидаторов и что разбираются только страницы категории с новыми ценами;
+после сокращения выдачи категории не изменившиеся страницы не ведут на исчезнувшие,
+а --force разбирает все страницы заново
+запуск из корня проекта: python -m scripts.check_svetofor_crawl --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from parsers import pars_svetofor
+from scripts.fixture_server import FixtureCatalog, start_fixture_server
+
+
+def _crawl(base_url: str, db_path: str, concurrency: int, resume=False, force=False):
+    pars_svetofor.initialize_db(db_path)
+    started = time.perf_counter()
+    # повторы в проверке не должны ждать секунды
+    stats = asyncio.run(pars_svetofor.crawl(
+        base_url, db_path, concurrency=concurrency, rate=0, backoff=0.01, resume=resume, force=force
+    ))
+    elapsed = time.perf_counter() - started
+    conn = sqlite3.connect(db_path)
+    stored = conn.execute("SELECT count(*) FROM svetofor_products").fetchone()[0]
+    conn.close()
+    return stats, stored, elapsed
+
+
+def _simulate_crash(db_path: str, category: int):
+    """забывает все страницы категории, кроме первой, как если бы обход упал на второй"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "UPDATE crawl_state SET status = 'pending', fetched_at = NULL WHERE url LIKE ?",
+        (f"%/cat-{category}/?page=%",),
+    )
+    conn.execute("DELETE FROM page_validators WHERE url LIKE ?", (f"%/cat-{category}/?page=%",))
+    conn.execute("DELETE FROM svetofor_products WHERE name LIKE ?", (f"Товар {category}-%",))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка ответа сервера, с")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="доля ответов 503")
+    parser.add_argument("--concurrency", type=int, default=pars_svetofor.CONCURRENCY)
+    args = parser.parse_args()
+
+    catalog = FixtureCatalog(args.categories, args.pages, args.per_page)
+    server, base_url, server_stats = start_fixture_server(catalog, args.latency, args.fail_rate)
+    ok = True
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, concurrency in (("последовательно", 1), ("параллельно", args.concurrency)):
+                stats, stored, elapsed = _crawl(base_url, os.path.join(tmp, f"{concurrency}.db"), concurrency)
+                results[label] = elapsed
+                print(f"{label}: страниц {stats['pages']}, товаров в БД {stored} "
+                      f"из {catalog.product_count()} за {elapsed:.2f} с")
+                ok = ok and stored == catalog.product_count()
+
+            if args.pages > 1:
+                db_path = os.path.join(tmp, f"{args.concurrency}.db")
+                _simulate_crash(db_path, category=0)
+                requests_before = server_stats["requests"]
+                stats, stored, elapsed = _crawl(base_url, db_path, args.concurrency, resume=True)
+                requests = server_stats["requests"] - requests_before
+                print(f"продолжение: загружено страниц {stats['pages']}, пропущено свежих {stats['skipped']}, "
+                      f"запросов {requests}, товаров в БД {stored} за {elapsed:.2f} с")
+                # первая страница категории 0 свежая, её товары удалены и не вернутся
+                expected = catalog.product_count() - args.per_page
+                ok = ok and stored == expected and stats["pages"] == args.pages - 1
+
+            # повторные обходы: всё не изменилось / без ETag / цены одной категории поменялись /
+            # выдача категории 2 сократилась на страницу (её последняя страница изменилась -
+            # пропала ссылка на следующую) / то же без изменений / --force
+            db_path = os.path.join(tmp, f"{args.concurrency}.db")
+            total_pages = args.categories * args.pages
+            shrunk = {2: args.pages - 1} if args.pages > 1 and args.categories > 2 else {}
+            shrunk_pages = total_pages - len(shrunk)
+            for label, validators, changed, pages_left, force, expected_pages, expected_unchanged in (
+                ("повторно (304)", True, set(), {}, False, total_pages, total_pages),
+                ("повторно без ETag (хэш)", False, set(), {}, False, total_pages, total_pages),
+                ("повторно, цены категории 1 изменились", False, {1}, {}, False,
+                 total_pages, total_pages - args.pages),
+                ("повторно, выдача категории 2 сократилась", True, {1}, shrunk, False,
+                 shrunk_pages, shrunk_pages - len(shrunk)),
+                ("повторно после сокращения (304)", True, {1}, shrunk, False, shrunk_pages, shrunk_pages),
+                ("повторно с --force", True, {1}, shrunk, True, shrunk_pages, 0),
+            ):
+                catalog.validators = validators
+                catalog.changed = changed
+                catalog.shrunk = pages_left
+                not_modified_before = server_stats["not_modified"]
+                stats, stored, elapsed = _crawl(base_url, db_path, args.concurrency, force=force)
+                not_modified = server_stats["not_modified"] - not_modified_before
+                print(f"{label}: страниц {stats['pages']}, не изменилось {stats['unchanged']} "
+                      f"(из них 304: {not_modified}), разобрано {stats['pages'] - stats['unchanged']} за {elapsed:.2f} с")
+                ok = ok and stats["pages"] == expected_pages and stats["unchanged"] == expected_unchanged
+    finally:
+        server.shutdown()
+
+    print(f"Запросов к серверу: {server_stats['requests']}, из них 503: {server_stats['failed']}")
+    print(f"Ускорение: x{results['последовательно'] / results['параллельно']:.1f}")
+    print("OK" if ok else "ОШИБКА: собраны не все товары")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
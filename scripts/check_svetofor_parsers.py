@@ -0,0 +1,48 @@
+"""
+проверка способов разбора страниц Светофора на сохранённых html-фикстурах (scripts/fixtures/svetofor)
+
+каждый способ из pars_svetofor.PARSERS должен вернуть те же товары и ту же ссылку
+на следующую страницу, что и прежний разбор полным деревом BeautifulSoup
+запуск из корня проекта: python -m scripts.check_svetofor_parsers
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from parsers import pars_svetofor
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "svetofor"
+REFERENCE_PARSER = "bs4"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="каталог с html-страницами")
+    args = parser.parse_args()
+
+    pages = sorted(Path(args.fixtures).glob("*.html"))
+    print(f"Способы разбора: {', '.join(sorted(pars_svetofor.PARSERS))}")
+    ok = bool(pages)
+    for page in pages:
+        html = page.read_text(encoding="utf-8")
+        expected = pars_svetofor.parse_products(html, "Категория", pars_svetofor.BASE_URL, REFERENCE_PARSER)
+        for name in sorted(pars_svetofor.PARSERS):
+            result = pars_svetofor.parse_products(html, "Категория", pars_svetofor.BASE_URL, name)
+            if result == expected:
+                continue
+            ok = False
+            print(f"{page.name}: {name} расходится с {REFERENCE_PARSER}")
+            for row in sorted(set(expected[0]) - set(result[0]), key=str):
+                print(f"    не найден: {row}")
+            for row in sorted(set(result[0]) - set(expected[0]), key=str):
+                print(f"    лишний: {row}")
+            if result[1] != expected[1]:
+                print(f"    следующая страница: {result[1]} вместо {expected[1]}")
+        print(f"{page.name}: товаров {len(expected[0])}, следующая страница {expected[1]}")
+
+    print("OK" if ok else "ОШИБКА: способы разбора дают разный результат")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+локальный HTTP-сервер с синтетическим каталогом Светофора для проверки парсеров без сети
+
+страницы: /catalog/ со списком категорий и /catalog/cat-<i>/?page=<n> с карточками
+товаров и ссылкой rel="next" на следующую страницу выдачи
+задержка ответа и доля ответов 503 настраиваются, чтобы проверять параллельность и повторы;
+сервер отдаёт ETag и Last-Modified и отвечает 304 на условный запрос (выключается
+catalog.validators = False), цены категорий из catalog.changed меняются, а в категориях
+из catalog.shrunk остаётся меньше страниц
+запуск из корня проекта: python -m scripts.fixture_server --port 8765
+"""
+import argparse
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class FixtureCatalog:
+    """синтетический каталог: categories категорий по pages страниц из per_page товаров"""
+
+    def __init__(self, categories=6, pages=3, per_page=20, seed=1):
+        self.categories = categories
+        self.pages = pages
+        self.per_page = per_page
+        self.seed = seed
+        # отдавать ли ETag / Last-Modified и отвечать 304
+        self.validators = True
+        # категории, цены в которых поменялись
+        self.changed = set()
+        # категории, выдача которых сократилась: {категория: страниц}
+        self.shrunk = {}
+
+    def catalog_page(self) -> str:
+        links = "\n".join(
+            f'<a class="section-links__item" href="/catalog/cat-{i}/">Категория {i}</a>'
+            for i in range(self.categories)
+        )
+        return f'<html><body><div class="section-links__list">\n{links}\n</div></body></html>'
+
+    def product_price(self, category: int, page: int, k: int) -> float:
+        version = 2 if category in self.changed else 1
+        rng = random.Random(f"{self.seed}:{version}:{category}:{page}:{k}")
+        return round(rng.uniform(30, 900), 2)
+
+    def pages_of(self, category: int) -> int:
+        return self.shrunk.get(category, self.pages)
+
+    def category_page(self, category: int, page: int):
+        """html страницы выдачи или None, если такой страницы нет"""
+        if not (0 <= category < self.categories and 1 <= page <= self.pages_of(category)):
+            return None
+        cards = []
+        for k in range(self.per_page):
+            price = self.product_price(category, page, k)
+            cards.append(
+                f'<div class="card">'
+                f'<a class="card__link" href="/product/{category}-{page}-{k}/">'
+                f'<div class="card__title">Товар {category}-{page}-{k}</div></a>'
+                f'<div class="card__price">{price:.2f} ₽/шт</div>'
+                f'</div>'
+            )
+        next_link = ""
+        if page < self.pages_of(category):
+            next_link = f'<a rel="next" href="/catalog/cat-{category}/?page={page + 1}">Дальше</a>'
+        return (
+            '<html><body><div class="cards__list">\n' + "\n".join(cards) + "\n</div>"
+            f'<div class="pagination">{next_link}</div></body></html>'
+        )
+
+    def product_count(self) -> int:
+        return sum(self.pages_of(category) for category in range(self.categories)) * self.per_page
+
+
+def _make_handler(catalog, latency, fail_rate, stats):
+    rng = random.Random(0)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_page(self, body):
+            """200 со страницей или 304, если у клиента та же версия"""
+            if not catalog.validators:
+                self._send(200, body)
+                return
+            etag = '"' + hashlib.sha1(body.encode()).hexdigest()[:16] + '"'
+            headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED}
+            if self.headers.get("If-None-Match") == etag:
+                with lock:
+                    stats["not_modified"] += 1
+                self._send(304, "", headers)
+                return
+            self._send(200, body, headers)
+
+        def _send(self, status, body="", headers=None):
+            data = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if status != 304:
+                self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+                fail = rng.random() < fail_rate
+            time.sleep(latency)
+            if fail:
+                with lock:
+                    stats["failed"] += 1
+                self._send(503, "busy", {"Retry-After": "0"})
+                return
+
+            parts = urlsplit(self.path)
+            if parts.path == "/catalog/":
+                self._send(200, catalog.catalog_page())
+                return
+            segments = parts.path.strip("/").split("/")
+            if len(segments) == 2 and segments[0] == "catalog" and segments[1].startswith("cat-"):
+                try:
+                    category = int(segments[1][4:])
+                    page = int(parse_qs(parts.query).get("page", ["1"])[0])
+                except ValueError:
+                    category, page = -1, 0
+                html = catalog.category_page(category, page)
+                if html is not None:
+                    self._send_page(html)
+                    return
+            self._send(404, "not found")
+
+    return Handler
+
+
+def start_fixture_server(catalog=None, latency=0.0, fail_rate=0.0, port=0):
+    """
+    запускает сервер в фоновом потоке
+    возвращает (сервер, базовый url, счётчики запросов); остановка - server.shutdown()
+    """
+    catalog = catalog or FixtureCatalog()
+    stats = {"requests": 0, "failed": 0, "not_modified": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(catalog, latency, fail_rate, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--categories", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка ответа, с")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="доля ответов 503")
+    args = parser.parse_args()
+
+    catalog = FixtureCatalog(args.categories, args.pages, args.per_page)
+    server, base_url, _ = start_fixture_server(catalog, args.latency, args.fail_rate, args.port)
+    print(f"Каталог: {base_url}/catalog/ (Ctrl+C - остановить)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+обновление схемы существующей основной БД без пересборки
+
+создаёт недостающие таблицы, колонки и индексы моделей (например, нормализованные
+названия товаров и индексы по категории и названию в БД, собранной старой версией)
+и включает WAL;
+сайт при этом может работать: индексы строятся в короткой транзакции записи
+запуск из корня проекта: python -m scripts.migrate_db --db data/food_tracker.db
+"""
+import argparse
+import os
+import sys
+
+from backend.app import create_app
+from backend.schema import upgrade_schema
+from parsers.merge_to_main_db import MAIN_DB_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default=MAIN_DB_PATH, help="файл основной БД")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.db)
+    if not os.path.exists(path):
+        print(f"Не найдена БД: {path}")
+        return 1
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "CACHE_TYPE": "null"})
+    with app.app_context():
+        try:
+            changes = upgrade_schema()
+        except RuntimeError as e:
+            print(f"Схему не обновить: {e}")
+            return 1
+    if changes["columns"]:
+        print(f"Добавлены колонки: {', '.join(changes['columns'])}")
+    if changes["backfilled"]:
+        print(f"Дополнены нормализованные названия товаров: {changes['backfilled']}")
+    if changes["indexes"]:
+        print(f"Созданы индексы: {', '.join(changes['indexes'])}")
+    if not any(changes.values()):
+        print("Схема уже актуальна")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
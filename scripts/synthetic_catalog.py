@@ -0,0 +1,22 @@
+"""
+синтетический каталог для замеров: названия товаров из вида, бренда и размера
+и категории, общие для scripts.bench_basket и scripts.bench_merge_load
+"""
+from backend.extensions import db
+from backend.models import Category
+
+WORDS = ("Молоко", "Кефир", "Сыр", "Хлеб", "Масло", "Йогурт", "Творог", "Чай", "Кофе", "Гречка")
+BRANDS = ("Простоквашино", "Домик в деревне", "Савушкин", "Агуша", "Красная цена")
+SIZES = ("1 л", "900 мл", "0,5 кг", "200 г", "1 кг")
+
+
+def synthetic_name(rng, i: int) -> str:
+    """название i-го товара: номер делает названия разными"""
+    return f"{rng.choice(WORDS)} {rng.choice(BRANDS)} {rng.choice(SIZES)} №{i}"
+
+
+def add_categories(count: int):
+    """count категорий "Категория <i>" в сессии (без commit), возвращает их объекты"""
+    categories = [Category(name=f"Категория {i}", normalized_name=f"категория {i}") for i in range(count)]
+    db.session.add_all(categories)
+    return categories